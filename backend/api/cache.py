@@ -0,0 +1,171 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from foodgram.routers import read_alias
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from rest_framework.response import Response
+
+# Поколение всех закешированных ответов: меняется при правке тегов,
+# ингредиентов и авторов, которые входят в любой рецепт
+GENERATION_KEY = "recipes:generation"
+# Поколение списков рецептов: меняется при любом изменении рецепта
+LIST_GENERATION_KEY = "recipes:list:generation"
+# Версия кеша отдельного рецепта: меняется при его изменении
+DETAIL_VERSION_KEY = "recipes:detail:version:{}"
+STATS_KEY = "recipes:stats:{}"
+# Фрагмент рецепта по версиям снимков тегов и ингредиентов, из которых
+# он собран: процесс с устаревшим снимком не затрет свежие фрагменты
+FRAGMENT_KEY = "recipes:fragment:{}:{}:{}:{}"
+# Поля пользователя, которые входят в представление автора рецепта
+AUTHOR_FIELDS = ("email", "username", "first_name", "last_name")
+
+
+def recipe_cache():
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def _generation(key, initial=1):
+    cache = recipe_cache()
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, initial, None)
+        return cache.get(key, initial)
+    return generation
+
+
+def _bump(key, initial=1):
+    cache = recipe_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, None)
+
+
+def _origin(request):
+    """Схема и хост запроса: ответы содержат абсолютные ссылки"""
+    return f"{request.scheme}://{request.get_host()}"
+
+
+def _count(name):
+    _bump(STATS_KEY.format(name))
+
+
+def list_cache_key(request):
+    """Ключ кеша списка рецептов по параметрам фильтрации.
+    Запросы с другими параметрами не кешируются
+    """
+    params = request.query_params
+    if set(params) - set(settings.RECIPES_CACHE_LIST_PARAMS):
+        return None
+    query = urlencode(sorted(
+        (name, value)
+        for name in params
+        for value in params.getlist(name)
+    ))
+    return (f"recipes:list:{_generation(GENERATION_KEY)}:"
+            f"{_generation(LIST_GENERATION_KEY)}:{_origin(request)}:{query}")
+
+
+def detail_cache_key(request, pk):
+    # Вытесненная из кеша версия начинается заново с текущего времени,
+    # чтобы не совпасть с ключами уже сохраненных ответов
+    version = _generation(DETAIL_VERSION_KEY.format(pk), time.time_ns())
+    return (f"recipes:detail:{_generation(GENERATION_KEY)}:{version}:"
+            f"{_origin(request)}:{pk}")
+
+
+def author_fields(instance):
+    # Значения берутся из __dict__, чтобы не загружать отложенные поля
+    return tuple(instance.__dict__.get(field) for field in AUTHOR_FIELDS)
+
+
+def fragment_cache_keys(pks):
+    generation = _generation(GENERATION_KEY)
+    tags, ingredients = tag_catalogue.version(), ingredient_catalogue.version()
+    return {
+        pk: FRAGMENT_KEY.format(generation, tags, ingredients, pk)
+        for pk in pks
+    }
+
+
+def cached_fragments(recipes, build):
+    """Общие для всех пользователей представления рецептов.
+    Фрагменты читаются одним get_many, недостающие и устаревшие
+    по updated_at рецепта или полям автора строятся функцией build
+    и сохраняются set_many
+    """
+    keys = fragment_cache_keys(recipe.pk for recipe in recipes)
+    cache = recipe_cache()
+    stored = cache.get_many(list(keys.values()))
+    fragments, missing = [], {}
+    for recipe in recipes:
+        entry = stored.get(keys[recipe.pk])
+        version = (recipe.updated_at, author_fields(recipe.author))
+        if entry is None or entry[0] != version:
+            entry = (version, build(recipe))
+            missing[keys[recipe.pk]] = entry
+        fragments.append(entry[1])
+    if missing:
+        cache.set_many(missing, settings.RECIPES_FRAGMENT_TIMEOUT)
+    return fragments
+
+
+def invalidate_recipe(pk=None):
+    """Сбрасывает кеш рецепта, его фрагмент и все списки рецептов"""
+    if pk is not None:
+        _bump(DETAIL_VERSION_KEY.format(pk), time.time_ns())
+        recipe_cache().delete_many(list(fragment_cache_keys([pk]).values()))
+    _bump(LIST_GENERATION_KEY)
+
+
+def invalidate_all():
+    """Сбрасывает все закешированные ответы"""
+    _bump(GENERATION_KEY)
+
+
+def cache_stats():
+    """Счетчики попаданий и промахов кеша"""
+    cache = recipe_cache()
+    return {
+        name: cache.get(STATS_KEY.format(name), 0)
+        for name in ("hits", "misses")
+    }
+
+
+class AnonymousCacheMixin:
+    """Кеширует ответы list и retrieve для анонимных пользователей,
+    для которых is_favorited и is_in_shopping_cart всегда False
+    """
+
+    def cached_response(self, key, view, request, *args, **kwargs):
+        if key is None or not request.user.is_anonymous:
+            return view(request, *args, **kwargs)
+        cache = recipe_cache()
+        data = cache.get(key)
+        if data is not None:
+            _count("hits")
+            return Response(data)
+        _count("misses")
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Ответ с реплики может отставать от уже сброшенного поколения
+            cache.set(key, response.data,
+                      settings.REPLICA_CACHE_TIMEOUT if read_alias.get()
+                      else DEFAULT_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            list_cache_key(request), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            detail_cache_key(
+                request, kwargs[self.lookup_url_kwarg or self.lookup_field]
+            ),
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,65 @@
+from recipes.models import Recipe, TableVersion
+
+# Таблицы, данные которых входят в представление рецепта
+RECIPE_TABLES = (
+    TableVersion.TAGS, TableVersion.INGREDIENTS, TableVersion.AUTHORS
+)
+
+
+def _versions(request, *names):
+    """Версии справочников, один запрос на запрос клиента"""
+    cached = getattr(request, "_table_versions", None)
+    if cached is None or not set(names) <= set(cached):
+        cached = TableVersion.current(*names)
+        request._table_versions = cached
+    return cached
+
+
+def table_etag(*names):
+    def etag(request, *args, **kwargs):
+        versions = _versions(request, *names)
+        return "-".join(
+            f"{name}{versions[name][0]}" for name in names
+        )
+    return etag
+
+
+def table_last_modified(*names):
+    def last_modified(request, *args, **kwargs):
+        versions = _versions(request, *names)
+        dates = [date for _, date in versions.values() if date]
+        return max(dates, default=None)
+    return last_modified
+
+
+def _recipe_updated_at(request, pk):
+    if not hasattr(request, "_recipe_updated_at"):
+        request._recipe_updated_at = Recipe.objects.filter(
+            pk=pk
+        ).values_list("updated_at", flat=True).first()
+    return request._recipe_updated_at
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    """ETag рецепта для анонимных пользователей:
+    у авторизованных ответ зависит от избранного и списка покупок.
+    Учитывает версии тегов, ингредиентов и авторов
+    """
+    if not request.user.is_anonymous:
+        return None
+    updated_at = _recipe_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    catalogue = table_etag(*RECIPE_TABLES)
+    return (f"recipe{pk}-{updated_at.timestamp()}-"
+            f"{catalogue(request)}")
+
+
+def recipe_last_modified(request, pk=None, **kwargs):
+    if not request.user.is_anonymous:
+        return None
+    updated_at = _recipe_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    catalogue = table_last_modified(*RECIPE_TABLES)(request)
+    return max(filter(None, [updated_at, catalogue]))
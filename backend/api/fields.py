@@ -0,0 +1,61 @@
+import io
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from foodgram.constants import (RECIPE_IMAGE_MAX_BYTES,
+                                RECIPE_IMAGE_MAX_DIMENSION)
+from PIL import Image
+from rest_framework import serializers
+
+
+class RecipeImageField(Base64ImageField):
+    """Base64-изображение рецепта.
+    Размер файла проверяется по длине base64 до декодирования,
+    разрешение — по заголовку изображения до распаковки пикселей
+    """
+
+    def to_internal_value(self, base64_data):
+        if isinstance(base64_data, str):
+            payload = base64_data.split(";base64,")[-1]
+            if len(payload) * 3 // 4 > RECIPE_IMAGE_MAX_BYTES:
+                raise serializers.ValidationError(
+                    "Размер изображения не должен превышать "
+                    f"{RECIPE_IMAGE_MAX_BYTES // (1024 * 1024)} МБ"
+                )
+        return super().to_internal_value(base64_data)
+
+    def get_file_extension(self, filename, decoded_file):
+        try:
+            width, height = Image.open(io.BytesIO(decoded_file)).size
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if max(width, height) > RECIPE_IMAGE_MAX_DIMENSION:
+            raise serializers.ValidationError(
+                "Разрешение изображения не должно превышать "
+                f"{RECIPE_IMAGE_MAX_DIMENSION}px по любой стороне"
+            )
+        return super().get_file_extension(filename, decoded_file)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные варианты изображения рецепта.
+    Пока варианты текущего изображения не готовы, словарь пуст
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        stored = recipe.image_variants or {}
+        if stored.get("source") != recipe.image.name:
+            return {}
+        request = self.context.get("request")
+        variants = {}
+        for variant, name in stored.items():
+            if variant == "source":
+                continue
+            url = default_storage.url(name)
+            variants[variant] = (request.build_absolute_uri(url)
+                                 if request else url)
+        return variants
@@ -1,5 +1,8 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe
+from recipes.catalogue import tag_catalogue
+from recipes.models import Recipe, RecipeFavorites, ShoppingList
+from recipes.search import search
 from rest_framework.filters import SearchFilter
 from users.models import User
 
@@ -11,28 +14,75 @@ class IngredientSearchFilter(SearchFilter):
     search_param = "name"
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую"""
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_catalogue.ids_by_slug()]
+
+
 class RecipesFilter(FilterSet):
     """Фильтрует рецепты по
-    избранному, автору, списку покупок и
-    тегам"""
+    избранному, автору, списку покупок,
+    тегам, имеющимся ингредиентам и
+    полнотекстовому запросу"""
 
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(field_name="tags__slug")
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method="filter_tags")
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    ingredients = NumberInFilter(method="filter_ingredients")
+    ingredients_all = filters.BooleanFilter(method="filter_ingredients_all")
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
         fields = ["author", "tags"]
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов.
+        Полусоединение не размножает рецепты с несколькими тегами
+        """
+        ids_by_slug = tag_catalogue.ids_by_slug()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef("pk"),
+            tag_id__in=[ids_by_slug[slug] for slug in value],
+        )))
+
+    def filter_user_list(self, queryset, model, value):
+        """Рецепты из списка пользователя (избранное, покупки)"""
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=self.request.user, recipes_id=OuterRef("pk")
+        )))
+
     def filter_is_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(recipefavorites__user=self.request.user)
-        return queryset.objects.all()
+        return self.filter_user_list(queryset, RecipeFavorites, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return queryset.filter(shoppinglist__user=self.request.user)
-        return queryset.objects.all()
+        return self.filter_user_list(queryset, ShoppingList, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты из имеющихся ингредиентов,
+        отсортированные по доле их покрытия"""
+        return queryset.covering(
+            (int(pk) for pk in value),
+            require_all=bool(self.form.cleaned_data.get("ingredients_all")),
+        )
+
+    def filter_ingredients_all(self, queryset, name, value):
+        """Учитывается в filter_ingredients"""
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию"""
+        if not value.strip():
+            return queryset
+        return search(queryset, value)
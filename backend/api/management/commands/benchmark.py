@@ -0,0 +1,415 @@
+import base64
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from recipes.management.commands.import_data import batched, read_csv
+from recipes.models import (Follow, Ingredient, IngredientRecipes, Recipe,
+                            RecipeFavorites, ShoppingList, Tag)
+from rest_framework.test import APIClient
+from users.models import User
+
+PASSWORD = "benchmark-password"
+BATCH_SIZE = 5000
+IMAGE_NAME = "recipes/images/benchmark.png"
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга"""
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+def recipe_payload(context):
+    return {
+        "ingredients": [{"id": pk, "amount": 10}
+                        for pk in context["ingredient_ids"][:10]],
+        "tags": context["tag_ids"][:2],
+        "image": context["image"],
+        "name": "Рецепт для замера",
+        "text": "Описание рецепта для замера производительности",
+        "cooking_time": 30,
+    }
+
+
+def create_recipe(client, context):
+    response = client.post("/api/recipes/", recipe_payload(context),
+                           format="json")
+    return {"new_recipe_id": response.data["id"]}
+
+
+def toggle(path, present):
+    """Подготовка шага: неизмеряемыми запросами удаляет связь
+    и при present создает ее заново
+    """
+    def prepare(client, context):
+        client.delete(path.format(**context))
+        if present:
+            client.post(path.format(**context))
+        return {}
+    return prepare
+
+
+def new_user(context):
+    context["counter"] += 1
+    return {
+        "email": f"new{context['counter']}@benchmark.test",
+        "username": f"new{context['counter']}",
+        "first_name": "Имя",
+        "last_name": "Фамилия",
+        "password": PASSWORD,
+    }
+
+
+# (название, метод, путь, пользователь, тело запроса, подготовка)
+ROUTES = [
+    ("tags-list", "get", "/api/tags/", None, None, None),
+    ("tags-detail", "get", "/api/tags/{tag_id}/", None, None, None),
+    ("ingredients-list", "get", "/api/ingredients/", None, None, None),
+    ("ingredients-search", "get", "/api/ingredients/?name={prefix}",
+     None, None, None),
+    ("ingredients-detail", "get", "/api/ingredients/{ingredient_id}/",
+     None, None, None),
+    ("ingredients-autocomplete", "get",
+     "/api/ingredients/autocomplete/?name={prefix}", None, None, None),
+    ("recipes-list-anonymous", "get", "/api/recipes/", None, None, None),
+    ("recipes-list", "get", "/api/recipes/", "user", None, None),
+    ("recipes-list-tags", "get",
+     "/api/recipes/?tags={tag_slug}&tags={other_tag_slug}",
+     "user", None, None),
+    ("recipes-list-favorited", "get", "/api/recipes/?is_favorited=1",
+     "user", None, None),
+    ("recipes-list-in-cart", "get", "/api/recipes/?is_in_shopping_cart=1",
+     "user", None, None),
+    ("recipes-list-author", "get", "/api/recipes/?author={author_id}",
+     "user", None, None),
+    ("recipes-list-ingredients", "get",
+     "/api/recipes/?ingredients={ingredient_id},{other_ingredient_id}",
+     "user", None, None),
+    ("recipes-list-search", "get", "/api/recipes/?search=рецепт",
+     "user", None, None),
+    ("recipes-list-cursor", "get", "/api/recipes/?pagination=cursor",
+     "user", None, None),
+    ("recipes-list-popular", "get", "/api/recipes/?ordering=popular",
+     "user", None, None),
+    ("recipes-list-last-page", "get", "/api/recipes/?page={last_page}",
+     "user", None, None),
+    ("recipes-feed", "get", "/api/recipes/feed/", "user", None, None),
+    ("recipes-detail-anonymous", "get", "/api/recipes/{recipe_id}/",
+     None, None, None),
+    ("recipes-detail", "get", "/api/recipes/{recipe_id}/", "user",
+     None, None),
+    ("recipes-create", "post", "/api/recipes/", "user", recipe_payload,
+     None),
+    ("recipes-update", "patch", "/api/recipes/{own_recipe_id}/", "user",
+     recipe_payload, None),
+    ("recipes-delete", "delete", "/api/recipes/{new_recipe_id}/", "user",
+     None, create_recipe),
+    ("shopping-cart-download", "get",
+     "/api/recipes/download_shopping_cart/", "user", None, None),
+    ("shopping-cart-download-csv", "get",
+     "/api/recipes/download_shopping_cart/?format=csv", "user", None, None),
+    ("favorite-add", "post", "/api/recipes/{recipe_id}/favorite/", "user",
+     None, toggle("/api/recipes/{recipe_id}/favorite/", False)),
+    ("favorite-remove", "delete", "/api/recipes/{recipe_id}/favorite/",
+     "user", None, toggle("/api/recipes/{recipe_id}/favorite/", True)),
+    ("shopping-cart-add", "post", "/api/recipes/{recipe_id}/shopping_cart/",
+     "user", None,
+     toggle("/api/recipes/{recipe_id}/shopping_cart/", False)),
+    ("shopping-cart-remove", "delete",
+     "/api/recipes/{recipe_id}/shopping_cart/", "user", None,
+     toggle("/api/recipes/{recipe_id}/shopping_cart/", True)),
+    ("users-list", "get", "/api/users/", None, None, None),
+    ("users-detail", "get", "/api/users/{author_id}/", "user", None, None),
+    ("users-me", "get", "/api/users/me/", "user", None, None),
+    ("users-create", "post", "/api/users/", None, new_user, None),
+    ("users-set-password", "post", "/api/users/set_password/", "user",
+     lambda context: {"new_password": PASSWORD,
+                      "current_password": PASSWORD}, None),
+    ("users-subscriptions", "get", "/api/users/subscriptions/", "user",
+     None, None),
+    ("users-subscriptions-limit", "get",
+     "/api/users/subscriptions/?recipes_limit=3", "user", None, None),
+    ("subscribe", "post", "/api/users/{unfollowed_id}/subscribe/", "user",
+     None, toggle("/api/users/{unfollowed_id}/subscribe/", False)),
+    ("unsubscribe", "delete", "/api/users/{unfollowed_id}/subscribe/",
+     "user", None, toggle("/api/users/{unfollowed_id}/subscribe/", True)),
+    ("token-login", "post", "/api/auth/token/login/", None,
+     lambda context: {"email": context["email"], "password": PASSWORD},
+     None),
+    ("token-logout", "post", "/api/auth/token/logout/", "user", None, None),
+    ("metrics", "get", "/api/metrics/", "admin", None, None),
+]
+
+
+class Command(BaseCommand):
+    help = ("Замер количества SQL-запросов, задержки и памяти "
+            "для каждого маршрута API на синтетических данных "
+            "во временной тестовой базе")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument(
+            "--ingredients", type=int, default=0,
+            help="Сколько ингредиентов взять из data/ingredients.csv "
+                 "(0 — все)",
+        )
+        parser.add_argument("--favorites", type=int, default=20,
+                            help="Избранных рецептов на пользователя")
+        parser.add_argument("--carts", type=int, default=5,
+                            help="Рецептов в списке покупок пользователя")
+        parser.add_argument("--follows", type=int, default=10,
+                            help="Подписок на пользователя")
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--route", action="append", default=[],
+            help="Замерить только указанные маршруты",
+        )
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare", metavar="REPORT",
+            help="Сравнить с предыдущим отчетом",
+        )
+
+    def handle(self, *args, **options):
+        names = {route[0] for route in ROUTES}
+        unknown = set(options["route"]) - names
+        if unknown:
+            raise CommandError(f"Неизвестные маршруты: {sorted(unknown)}")
+        if options["iterations"] < 1 or options["recipes"] < 1:
+            raise CommandError("--iterations и --recipes больше нуля")
+        if options["users"] < 3:
+            raise CommandError("--users должен быть не меньше 3")
+        setup_test_environment()
+        media_root = tempfile.mkdtemp(prefix="foodgram-benchmark-")
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            random.seed(options["seed"])
+            started = time.perf_counter()
+            context = self.seed(options)
+            seeded = time.perf_counter() - started
+            results = {
+                name: self.measure(route, context, options["iterations"])
+                for route in ROUTES
+                for name in [route[0]]
+                if not options["route"] or name in options["route"]
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            media.disable()
+            shutil.rmtree(media_root, ignore_errors=True)
+            teardown_test_environment()
+        report = {
+            "meta": {
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "seed": options["seed"],
+                "seed_seconds": round(seeded, 2),
+                "dataset": {
+                    name: options[name]
+                    for name in ("users", "recipes", "ingredients",
+                                 "favorites", "carts", "follows")
+                },
+            },
+            "routes": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+        self.print_report(results, options["compare"])
+
+    def seed(self, options):
+        """Заполняет базу синтетическими данными"""
+        image = png_bytes()
+        default_storage.save(IMAGE_NAME, ContentFile(image))
+        path = os.path.join(settings.CSV_FILES_DIR, "ingredients.csv")
+        with open(path, encoding="utf-8") as file:
+            rows = list(read_csv(file))
+        if options["ingredients"]:
+            rows = rows[:options["ingredients"]]
+        for batch in batched(rows, BATCH_SIZE):
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch],
+                ignore_conflicts=True,
+            )
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        Tag.objects.bulk_create([
+            Tag(name=name, slug=slug)
+            for name, slug in [("Завтрак", "breakfast"), ("Обед", "lunch"),
+                               ("Ужин", "dinner")]
+        ])
+        tag_ids = list(Tag.objects.values_list("id", flat=True))
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(email=f"user{n}@benchmark.test", username=f"user{n}",
+                 first_name="Имя", last_name="Фамилия", password=password,
+                 is_staff=n == 0)
+            for n in range(options["users"])
+        ])
+        user_ids = list(User.objects.values_list("id", flat=True))
+        for batch in batched(range(options["recipes"]), BATCH_SIZE):
+            Recipe.objects.bulk_create([
+                Recipe(author_id=random.choice(user_ids),
+                       name=f"Рецепт {n}",
+                       text=f"Описание рецепта номер {n}",
+                       image=IMAGE_NAME,
+                       cooking_time=random.randint(1, 180))
+                for n in batch
+            ])
+        recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+        through = Recipe.tags.through
+        self.bulk(through(recipe_id=recipe_id, tag_id=tag_id)
+                  for recipe_id in recipe_ids
+                  for tag_id in random.sample(tag_ids, random.randint(1, 2)))
+        self.bulk(IngredientRecipes(recipes_id=recipe_id,
+                                    ingredients_id=ingredient_id,
+                                    amount=random.randint(1, 500))
+                  for recipe_id in recipe_ids
+                  for ingredient_id in random.sample(
+                      ingredient_ids, min(len(ingredient_ids),
+                                          random.randint(5, 40))))
+        for model, per_user in ((RecipeFavorites, options["favorites"]),
+                                (ShoppingList, options["carts"])):
+            self.bulk(model(user_id=user_id, recipes_id=recipe_id)
+                      for user_id in user_ids
+                      for recipe_id in random.sample(
+                          recipe_ids, min(per_user, len(recipe_ids))))
+        self.bulk(Follow(user_id=user_id, author_id=author_id)
+                  for user_id in user_ids
+                  for author_id in random.sample(
+                      user_ids[2:], min(options["follows"],
+                                        len(user_ids) - 2))
+                  if author_id != user_id)
+        call_command("recount", stdout=io.StringIO())
+        call_command("refresh_scores", full=True, stdout=io.StringIO())
+        call_command("rebuild_feed", stdout=io.StringIO())
+        user = User.objects.get(pk=user_ids[1])
+        own_recipe = Recipe.objects.create(
+            author=user, name="Свой рецепт", text="Описание",
+            image=IMAGE_NAME, cooking_time=10,
+        )
+        followed = set(user.follower.values_list("author_id", flat=True))
+        ingredient = Ingredient.objects.get(pk=ingredient_ids[0])
+        return {
+            "admin": User.objects.get(pk=user_ids[0]),
+            "user": user,
+            "email": user.email,
+            "author_id": user_ids[2],
+            "unfollowed_id": next(pk for pk in user_ids[2:]
+                                  if pk not in followed and pk != user.pk),
+            "recipe_id": recipe_ids[len(recipe_ids) // 2],
+            "own_recipe_id": own_recipe.pk,
+            "new_recipe_id": None,
+            "ingredient_id": ingredient_ids[0],
+            "other_ingredient_id": ingredient_ids[-1],
+            "ingredient_ids": random.sample(
+                ingredient_ids, min(10, len(ingredient_ids))
+            ),
+            "prefix": ingredient.name[:3],
+            "tag_id": tag_ids[0],
+            "tag_ids": tag_ids,
+            "tag_slug": "breakfast",
+            "other_tag_slug": "dinner",
+            "last_page": max(1, -(-len(recipe_ids) // 6)),
+            "image": ("data:image/png;base64,"
+                      + base64.b64encode(image).decode()),
+            "counter": 0,
+        }
+
+    def bulk(self, objects):
+        for batch in batched(objects, BATCH_SIZE):
+            type(batch[0]).objects.bulk_create(batch, ignore_conflicts=True)
+
+    def measure(self, route, context, iterations):
+        """Выполняет запрос iterations раз, возвращает число запросов
+        к базе, задержку и пик выделенной памяти
+        """
+        name, method, path, user, payload, prepare = route
+        client = APIClient()
+        if user:
+            client.force_authenticate(context[user])
+        for cache in caches.all():
+            cache.clear()
+        timings, queries, peaks, statuses = [], [], [], set()
+        tracemalloc.start()
+        try:
+            for _ in range(iterations):
+                if prepare:
+                    context.update(prepare(client, context))
+                data = payload(context) if payload else None
+                url = path.format(**context)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data,
+                                                       format="json")
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                    timings.append(time.perf_counter() - started)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+                queries.append(len(captured))
+                statuses.add(response.status_code)
+        finally:
+            tracemalloc.stop()
+        return {
+            "method": method.upper(),
+            "path": path,
+            "status": sorted(statuses),
+            "queries": max(queries),
+            "queries_min": min(queries),
+            "p50_ms": round(percentile(timings, 50) * 1000, 2),
+            "p95_ms": round(percentile(timings, 95) * 1000, 2),
+            "memory_peak_kb": round(percentile(peaks, 50) / 1024, 1),
+        }
+
+    def print_report(self, results, compare):
+        previous = {}
+        if compare:
+            with open(compare, encoding="utf-8") as file:
+                previous = json.load(file)["routes"]
+        for name, result in results.items():
+            line = (f"{name:32} {str(result['status']):12} "
+                    f"q={result['queries']:<4} "
+                    f"p50={result['p50_ms']:>8.2f}ms "
+                    f"p95={result['p95_ms']:>8.2f}ms "
+                    f"mem={result['memory_peak_kb']:>8.1f}KB")
+            before = previous.get(name)
+            if before:
+                line += (f"  Δq={result['queries'] - before['queries']:+d} "
+                         f"Δp50={result['p50_ms'] - before['p50_ms']:+.2f}ms")
+            style = (self.style.ERROR
+                     if before and result["queries"] > before["queries"]
+                     else self.style.SUCCESS)
+            self.stdout.write(style(line))
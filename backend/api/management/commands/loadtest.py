@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from api.management.commands.benchmark import percentile
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    "/api/recipes/",
+    "/api/recipes/?tags=breakfast",
+    "/api/tags/",
+    "/api/ingredients/?name=а",
+]
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест запущенного сервера: одновременные клиенты "
+            "запрашивают маршруты по кругу заданное время. Для сравнения "
+            "режимов SERVER_MODE=wsgi и asgi запускается против каждого "
+            "с одинаковым числом воркеров и лимитом памяти")
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="Например http://localhost")
+        parser.add_argument("--path", action="append", default=[],
+                            help="Маршрут для запросов, можно несколько")
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=30.0,
+                            help="Длительность теста в секундах")
+        parser.add_argument(
+            "--read-delay", type=float, default=0.0,
+            help="Пауза между чтением частей ответа: медленный клиент",
+        )
+        parser.add_argument("--token", help="Токен для Authorization")
+        parser.add_argument("--label", default="",
+                            help="Метка режима в отчете")
+        parser.add_argument("--output", help="Записать отчет в JSON")
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["duration"] <= 0:
+            raise CommandError("--clients и --duration больше нуля")
+        paths = options["path"] or DEFAULT_PATHS
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        deadline = time.monotonic() + options["duration"]
+        lock = threading.Lock()
+        timings, statuses, errors = [], {}, []
+
+        def client(number):
+            session = requests.Session()
+            session.headers.update(headers)
+            index = number
+            while time.monotonic() < deadline:
+                url = options["base_url"].rstrip("/") + paths[
+                    index % len(paths)
+                ]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    with session.get(url, stream=True, timeout=60) as reply:
+                        for _ in reply.iter_content(16 * 1024):
+                            if options["read_delay"]:
+                                time.sleep(options["read_delay"])
+                        status = reply.status_code
+                except requests.RequestException as error:
+                    with lock:
+                        errors.append(type(error).__name__)
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    timings.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(options["clients"]) as executor:
+            list(executor.map(client, range(options["clients"])))
+        elapsed = time.monotonic() - started
+        if not timings:
+            raise CommandError(f"Нет успешных ответов, ошибки: {errors[:5]}")
+        report = {
+            "label": options["label"],
+            "clients": options["clients"],
+            "duration_s": round(elapsed, 2),
+            "requests": len(timings),
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50) * 1000, 2),
+            "p95_ms": round(percentile(timings, 95) * 1000, 2),
+            "p99_ms": round(percentile(timings, 99) * 1000, 2),
+            "statuses": {str(key): value for key, value in statuses.items()},
+            "errors": len(errors),
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
@@ -1,6 +1,123 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.db import DatabaseError, connections, transaction
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по статистике планировщика PostgreSQL.
+    Для остальных баз и при ошибке оценки возвращается точный COUNT(*)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    try:
+        with transaction.atomic(using=queryset.db):
+            rows = planner_rows(queryset, connection)
+    except (DatabaseError, LookupError, TypeError, ValueError):
+        rows = None
+    return queryset.count() if rows is None else rows
+
+
+def planner_rows(queryset, connection):
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        # QuerySet.explain(format="json") в Django 3.2 склеивает str()
+        # строк, которые psycopg2 уже разобрал в списки, и JSON не выходит
+        sql, params = queryset.order_by().query.get_compiler(
+            using=queryset.db
+        ).as_sql()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация.
+    Параметр ?count=estimate заменяет COUNT(*) оценкой планировщика,
+    ?count=none не считает общее число записей вовсе
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = request.query_params.get(
+            self.count_query_param, "exact"
+        )
+        if self.count_mode not in ("estimate", "none"):
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.total = (estimate_count(queryset)
+                      if self.count_mode == "estimate" else None)
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.count_mode not in ("estimate", "none"):
+            return super().get_paginated_response(data)
+        url = self.request.build_absolute_uri()
+        next_link = previous_link = None
+        if self.has_next:
+            next_link = replace_query_param(
+                url, self.page_query_param, self.page_number + 1
+            )
+        if self.page_number == 2:
+            previous_link = remove_query_param(url, self.page_query_param)
+        elif self.page_number > 2:
+            previous_link = replace_query_param(
+                url, self.page_query_param, self.page_number - 1
+            )
+        return Response({
+            "count": self.total,
+            "next": next_link,
+            "previous": previous_link,
+            "results": data,
+        })
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация ленты рецептов по (pub_date, id):
+    страница выбирается по индексу без OFFSET и COUNT(*)
+    """
+
     page_size = 6
     page_size_query_param = 'limit'
+    ordering = ("-pub_date", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        annotations = queryset.query.annotations
+        for field in ("search_rank", "coverage"):
+            if field in annotations:
+                return (f"-{field}", "-pub_date", "-id")
+        if "rank" in annotations:
+            # Порядок индексов рейтинга, как в RecipeQuerySet.ranked_by
+            return ("-rank", "-score__recipe_id")
+        if "feed_pub_date" in annotations:
+            # Порядок индекса материализованной ленты, как в feed_queryset
+            return ("-feed_pub_date", "-feed_entries__recipe_id")
+        return self.ordering
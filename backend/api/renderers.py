@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+    Строки списка приходят итератором словарей с ключами
+    name, measurement_unit и amount и отдаются частями
+    """
+
+    charset = "utf-8"
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if isinstance(data, dict) or getattr(response, "exception", False):
+            # Ошибки (401, 404 на неизвестный ?format=) отдаются в JSON
+            if response is not None:
+                response["Content-Type"] = JSONRenderer.media_type
+            return JSONRenderer().render(data)
+        return b"".join(self.stream(data))
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    """Список покупок в виде текста"""
+
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, rows):
+        for row in rows:
+            yield (f"{row['name']} - {row['amount']} "
+                   f"{row['measurement_unit']}\n").encode(self.charset)
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    """Список покупок в формате CSV"""
+
+    media_type = "text/csv"
+    format = "csv"
+    header = ("name", "measurement_unit", "amount")
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(
+                [row[field] for field in self.header]
+            ).encode(self.charset)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    """Список покупок в формате JSON"""
+
+    media_type = "application/json"
+    format = "json"
+
+    def stream(self, rows):
+        separator = "["
+        for row in rows:
+            yield (separator + json.dumps(row, ensure_ascii=False)).encode(
+                self.charset
+            )
+            separator = ","
+        yield b"[]" if separator == "[" else b"]"
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    """Список покупок в виде PDF для печати"""
+
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    font_name = "ShoppingCartFont"
+    font_size = 12
+    margin = 50
+    line_height = 18
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_CART_PDF_FONT)
+            )
+
+    def stream(self, rows):
+        self.register_font()
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        y = height - self.margin
+        pdf.setFont(self.font_name, self.font_size)
+        for row in rows:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            pdf.drawString(
+                self.margin, y,
+                f"• {row['name']} - {row['amount']} "
+                f"{row['measurement_unit']}"
+            )
+            y -= self.line_height
+        pdf.save()
+        yield buffer.getvalue()
@@ -1,6 +1,12 @@
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from api.cache import cached_fragments
+from api.fields import ImageVariantsField, RecipeImageField
+from django.db import models, transaction
 from drf_extra_fields.fields import Base64ImageField
+from drf_yasg.utils import swagger_serializer_method
+from foodgram.constants import (POSITIVE_SMALL_MAX_VALUE,
+                                POSITIVE_SMALL_MIN_VALUE)
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from recipes.images import image_digest
 from recipes.models import (Follow,
                             Ingredient,
                             IngredientRecipes,
@@ -11,7 +17,6 @@ from recipes.models import (Follow,
                             )
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
-from django.core.exceptions import ValidationError
 from users.serializers import UserSerializer
 
 
@@ -34,22 +39,73 @@ class IngredientSerializer(serializers.ModelSerializer):
 class IngredientRecipesSerializer(serializers.ModelSerializer):
     """Сериализатор Ингредиенты в рецепте"""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
-    name = serializers.CharField(source="ingredients.name", read_only=True)
-    measurement_unit = serializers.CharField(
-        source="ingredients.measurement_unit", read_only=True
-    )
+    id = serializers.IntegerField(source="ingredients_id", read_only=True)
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = IngredientRecipes
         fields = ["id", "name", "measurement_unit", "amount"]
 
+    @staticmethod
+    def ingredient(obj):
+        """Название и единица измерения из справочника в памяти,
+        без соединения с таблицей ингредиентов
+        """
+        row = ingredient_catalogue.ingredient(obj.ingredients_id)
+        if row is None:
+            return obj.ingredients.name, obj.ingredients.measurement_unit
+        return row
+
+    @swagger_serializer_method(serializer_or_field=serializers.CharField())
+    def get_name(self, obj):
+        return self.ingredient(obj)[0]
+
+    @swagger_serializer_method(serializer_or_field=serializers.CharField())
+    def get_measurement_unit(self, obj):
+        return self.ingredient(obj)[1]
+
+
+def render_fields(serializer, instance, exclude=()):
+    """Представление объекта без полей exclude"""
+    data = {}
+    for field in serializer._readable_fields:
+        if field.field_name in exclude:
+            continue
+        attribute = field.get_attribute(instance)
+        data[field.field_name] = (
+            None if attribute is None else field.to_representation(attribute)
+        )
+    return data
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов: фрагменты всех рецептов страницы
+    читаются из кеша одним запросом
+    """
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        fragments = cached_fragments(recipes, self.child.fragment)
+        return [
+            self.child.personalize(recipe, fragment)
+            for recipe, fragment in zip(recipes, fragments)
+        ]
+
 
 class RecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор Рецепт"""
+    """Сериализатор Рецепт.
+    Представление собирается из закешированного фрагмента,
+    общего для всех пользователей, и флагов текущего пользователя
+    """
 
-    image = Base64ImageField()
-    tags = TagSerializer(read_only=True, many=True)
+    USER_FIELDS = ("is_favorited", "is_in_shopping_cart")
+
+    image = RecipeImageField()
+    image_variants = ImageVariantsField()
+    tags = serializers.SerializerMethodField()
     ingredients = IngredientRecipesSerializer(
         many=True, source="ingredientrecipes_set", read_only=True
     )
@@ -68,12 +124,73 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         ]
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.personalize(
+            instance, cached_fragments([instance], self.fragment)[0]
+        )
+
+    def fragment(self, instance):
+        """Представление рецепта без данных пользователя
+        и с относительными ссылками на изображения
+        """
+        serializer = getattr(self, "_fragment_serializer", None)
+        if serializer is None:
+            serializer = self._fragment_serializer = type(self)(context={})
+        data = render_fields(
+            serializer, instance, ("author", *self.USER_FIELDS)
+        )
+        data["author"] = render_fields(
+            serializer.fields["author"], instance.author, ("is_subscribed",)
+        )
+        return data
+
+    def personalize(self, instance, fragment):
+        """Дополняет фрагмент флагами текущего пользователя
+        и абсолютными ссылками на изображения
+        """
+        flags = {
+            "is_favorited": self.get_is_favorited(instance),
+            "is_in_shopping_cart": self.get_is_in_shopping_cart(instance),
+        }
+        data = {
+            name: flags[name] if name in flags else fragment[name]
+            for name in self.Meta.fields
+        }
+        if hasattr(instance, "author_subscribed"):
+            is_subscribed = instance.author_subscribed
+        else:
+            is_subscribed = self.fields["author"].get_is_subscribed(
+                instance.author
+            )
+        data["author"] = {**fragment["author"], "is_subscribed": is_subscribed}
+        request = self.context.get("request")
+        if request is not None:
+            if data["image"]:
+                data["image"] = request.build_absolute_uri(data["image"])
+            data["image_variants"] = {
+                variant: request.build_absolute_uri(url)
+                for variant, url in data["image_variants"].items()
+            }
+        return data
+
+    @swagger_serializer_method(serializer_or_field=TagSerializer(many=True))
+    def get_tags(self, obj):
+        """Теги рецепта из справочника в памяти по tag_ids"""
+        tag_ids = getattr(obj, "tag_ids", None)
+        if tag_ids is None:
+            tag_ids = obj.tags.order_by("id").values_list("id", flat=True)
+        return [tag_catalogue.tag(pk) for pk in tag_ids]
 
     def get_is_favorited(self, obj):
         """Проверка наличия рецепта в избранном"""
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
@@ -82,39 +199,116 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Проверка наличия рецепта в списке покупок"""
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
         return Recipe.objects.filter(shoppinglist__user=user,
                                      id=obj.id).exists()
 
+    @staticmethod
+    def parse_ids(values):
+        """Приводит идентификаторы к int,
+        возвращает (ids, некорректные значения)
+        """
+        ids, invalid = [], []
+        for value in values:
+            if isinstance(value, str) and value.isdecimal():
+                value = int(value)
+            if isinstance(value, int) and not isinstance(value, bool):
+                ids.append(value)
+            else:
+                invalid.append(value)
+        return ids, invalid
+
+    @staticmethod
+    def resolve_ids(model, ids):
+        """Загружает объекты одним запросом in_bulk,
+        возвращает (объекты, ошибки по id)
+        """
+        found = model.objects.in_bulk(set(ids))
+        errors = {}
+        missing = sorted({pk for pk in ids if pk not in found})
+        if missing:
+            errors["not_found"] = missing
+        duplicates = sorted(pk for pk in set(ids) if ids.count(pk) > 1)
+        if duplicates:
+            errors["duplicates"] = duplicates
+        return found, errors
+
     def validate(self, data):
         """Метод для валидации данных
-        перед созданием рецепта
+        перед созданием рецепта.
+        Ингредиенты и теги проверяются одним запросом каждые,
+        все ошибки возвращаются вместе
         """
         ingredients = self.initial_data.get("ingredients")
         if not ingredients:
             raise serializers.ValidationError(
                 {"ingredients": "В рецепте отсутсвуют ингредиенты"}
             )
-        ingredients_result = []
-        for ingredient_item in ingredients:
-            ingredient = get_object_or_404(Ingredient,
-                                           id=ingredient_item["id"]
-                                           )
-            if ingredient in ingredients_result:
-                raise serializers.ValidationError(
-                    "Ингредиент уже добавлен в рецепт"
-                )
-            amount = ingredient_item["amount"]
-            if not (isinstance(ingredient_item["amount"], int)
-                    or ingredient_item["amount"].isdigit()):
-                raise ValidationError("Неправильное количество ингидиента")
-
-            ingredients_result.append({"ingredients": ingredient,
-                                       "amount": amount
-                                       })
+        tags = self.initial_data.get("tags")
+        if not tags:
+            raise serializers.ValidationError(
+                {"tags": "В рецепте отсутсвуют теги"}
+            )
+        errors = {}
+        if not isinstance(ingredients, list):
+            errors["ingredients"] = (
+                "Ожидается список ингредиентов с полями id и amount"
+            )
+        if not isinstance(tags, list):
+            errors["tags"] = "Ожидается список id тегов"
+        if errors:
+            raise serializers.ValidationError(errors)
+        ingredient_errors, tag_errors = {}, {}
+        items = [item for item in ingredients if isinstance(item, dict)]
+        ingredient_ids, invalid_ids = self.parse_ids(
+            item.get("id") for item in items
+        )
+        if invalid_ids or len(items) != len(ingredients):
+            ingredient_errors["invalid"] = [
+                str(value) for value in invalid_ids
+            ] or ["Ингредиент должен быть объектом с полями id и amount"]
+        found_ingredients, errors = self.resolve_ids(
+            Ingredient, ingredient_ids
+        )
+        ingredient_errors.update(errors)
+        ingredients_result, invalid_amounts = [], []
+        for item in items:
+            amount = item.get("amount")
+            if isinstance(amount, str) and amount.isdigit():
+                amount = int(amount)
+            if (not isinstance(amount, int) or isinstance(amount, bool)
+                    or not POSITIVE_SMALL_MIN_VALUE
+                    <= amount <= POSITIVE_SMALL_MAX_VALUE):
+                invalid_amounts.append(item.get("id"))
+                continue
+            try:
+                ingredient = found_ingredients.get(int(item.get("id")))
+            except (TypeError, ValueError):
+                continue
+            if ingredient is not None:
+                ingredients_result.append({"ingredients": ingredient,
+                                           "amount": amount
+                                           })
+        if invalid_amounts:
+            ingredient_errors["invalid_amount"] = invalid_amounts
+        tag_ids, invalid_tags = self.parse_ids(tags)
+        if invalid_tags:
+            tag_errors["invalid"] = [str(value) for value in invalid_tags]
+        found_tags, errors = self.resolve_ids(Tag, tag_ids)
+        tag_errors.update(errors)
+        if ingredient_errors or tag_errors:
+            errors = {}
+            if ingredient_errors:
+                errors["ingredients"] = ingredient_errors
+            if tag_errors:
+                errors["tags"] = tag_errors
+            raise serializers.ValidationError(errors)
         data["ingredients"] = ingredients_result
+        data["tags"] = list(found_tags.values())
         return data
 
     def create_ingredients(self, ingredients, recipes):
@@ -132,26 +326,72 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Создание рецепта"""
         image = validated_data.pop("image")
         ingredients_data = validated_data.pop("ingredients")
-        recipes = Recipe.objects.create(image=image, **validated_data)
-        tags = self.initial_data.get("tags")
+        tags = validated_data.pop("tags")
+        recipes = Recipe.objects.create(image=image,
+                                        image_hash=image_digest(image),
+                                        **validated_data)
         recipes.tags.set(tags)
         self.create_ingredients(ingredients_data, recipes)
         return recipes
 
+    def update_ingredients(self, instance, ingredients):
+        """Приводит ингредиенты рецепта к новому списку:
+        добавляет новые, меняет количество у измененных,
+        удаляет лишние, не трогая совпадающие строки
+        """
+        current = {
+            row.ingredients_id: row
+            for row in instance.ingredientrecipes_set.all()
+        }
+        to_create, to_update = [], []
+        for item in ingredients:
+            row = current.pop(item["ingredients"].id, None)
+            if row is None:
+                to_create.append(IngredientRecipes(
+                    recipes=instance,
+                    ingredients=item["ingredients"],
+                    amount=item["amount"],
+                ))
+            elif row.amount != item["amount"]:
+                row.amount = item["amount"]
+                to_update.append(row)
+        if current:
+            IngredientRecipes.objects.filter(
+                id__in=[row.id for row in current.values()]
+            ).delete()
+        if to_update:
+            IngredientRecipes.objects.bulk_update(to_update, ["amount"])
+        if to_create:
+            IngredientRecipes.objects.bulk_create(to_create)
+
+    def update_tags(self, instance, tags):
+        """Меняет связи с тегами только при их изменении"""
+        current = {tag.id for tag in instance.tags.all()}
+        new = {tag.id for tag in tags}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+        instance.tag_ids = sorted(new)
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта"""
-        instance.image = validated_data.get("image", instance.image)
+        """Обновление рецепта.
+        Изображение пересохраняется, только если изменилось содержимое
+        """
+        image = validated_data.get("image")
+        if image is not None:
+            digest = image_digest(image)
+            if digest != instance.image_hash:
+                instance.image = image
+                instance.image_hash = digest
         instance.name = validated_data.get("name", instance.name)
         instance.text = validated_data.get("text", instance.text)
         instance.cooking_time = validated_data.get(
             "cooking_time", instance.cooking_time
         )
-        instance.tags.clear()
-        tags_data = self.initial_data.get("tags")
-        instance.tags.set(tags_data)
-        IngredientRecipes.objects.filter(recipes=instance).all().delete()
-        self.create_ingredients(validated_data.get("ingredients"), instance)
+        self.update_tags(instance, validated_data.get("tags"))
+        self.update_ingredients(instance, validated_data.get("ingredients"))
         instance.save()
         return instance
 
@@ -179,10 +419,11 @@ class FollowRecipeSerializer(serializers.ModelSerializer):
     """Урезанный сериализатор Рецепты для сериализатора Подписки ниже"""
 
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ["id", "name", "image", "cooking_time"]
+        fields = ["id", "name", "image", "image_variants", "cooking_time"]
         read_only_fields = ["id", "name", "image", "cooking_time"]
 
 
@@ -213,12 +454,16 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки
-        текущего пользователя на автора
+        текущего пользователя на автора.
+        Объект подписки существует, значит пользователь подписан
         """
-        return Follow.objects.filter(user=obj.user, author=obj.author).exists()
+        return True
 
     def get_recipes(self, obj):
         """Получение рецептов автора"""
+        if hasattr(obj.author, "latest_recipes"):
+            return FollowRecipeSerializer(obj.author.latest_recipes,
+                                          many=True).data
         request = self.context.get("request")
         limit = request.GET.get("recipes_limit")
         queryset = Recipe.objects.filter(author=obj.author)
@@ -230,7 +475,7 @@ class FollowSerializer(serializers.ModelSerializer):
         """Получение общего
         количества рецептов автора
         """
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,57 @@
+from api.cache import author_fields, invalidate_all, invalidate_recipe
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save)
+from django.dispatch import receiver
+from recipes.models import (Ingredient, IngredientRecipes, Recipe,
+                            TableVersion, Tag)
+from users.models import User
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipes)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    invalidate_recipe(instance.recipes_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_recipe(instance.pk)
+        return
+    for pk in pk_set or ():
+        invalidate_recipe(pk)
+    if action == "post_clear":
+        invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def catalogue_changed(sender, **kwargs):
+    invalidate_all()
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(sender, instance, **kwargs):
+    instance._author_fields = author_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, **kwargs):
+    """Сбрасывает кеш, только если у автора рецептов изменились
+    публичные поля. Регистрация, вход и смена пароля кеш не трогают.
+    При удалении автора кеш сбрасывают сигналы удаления его рецептов
+    """
+    fields = author_fields(instance)
+    changed = fields != instance._author_fields
+    instance._author_fields = fields
+    if created or not changed:
+        return
+    if Recipe.objects.filter(author=instance).exists():
+        TableVersion.bump(TableVersion.AUTHORS)
+        invalidate_all()
@@ -0,0 +1,69 @@
+from django.test import TestCase
+from foodgram.constants import (INGREDIENT_AUTOCOMPLETE_LIMIT,
+                                INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+from recipes.catalogue import ingredient_catalogue
+from recipes.models import Ingredient
+
+URL = "/api/ingredients/autocomplete/"
+
+
+class IngredientAutocompleteTest(TestCase):
+    """Автодополнение названий ингредиентов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in ("Сахар", "сахарная пудра", "Соль", "Ванильный сахар",
+                         "Молоко")
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Перец {index:02d}", measurement_unit="г")
+            for index in range(60)
+        )
+
+    def setUp(self):
+        ingredient_catalogue.invalidate()
+
+    def names(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.json()]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.names(name="сах"),
+            ["Сахар", "сахарная пудра", "Ванильный сахар"],
+        )
+
+    def test_response_shape(self):
+        response = self.client.get(URL, {"name": "Соль"})
+        ingredient = Ingredient.objects.get(name="Соль")
+        self.assertEqual(response.json(), [{
+            "id": ingredient.pk, "name": "Соль", "measurement_unit": "г",
+        }])
+
+    def test_limit(self):
+        self.assertEqual(len(self.names(name="перец")),
+                         INGREDIENT_AUTOCOMPLETE_LIMIT)
+        self.assertEqual(self.names(name="перец", limit=3),
+                         ["Перец 00", "Перец 01", "Перец 02"])
+        self.assertEqual(len(self.names(name="перец", limit=1000)),
+                         INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+        self.assertEqual(len(self.names(name="перец", limit=0)), 1)
+        self.assertEqual(len(self.names(name="перец", limit="x")),
+                         INGREDIENT_AUTOCOMPLETE_LIMIT)
+
+    def test_empty_and_short_queries(self):
+        self.assertEqual(self.names(name="", limit=2),
+                         ["Ванильный сахар", "Молоко"])
+        self.assertEqual(self.names(limit=2), ["Ванильный сахар", "Молоко"])
+        self.assertEqual(self.names(name="м"), ["Молоко"])
+        self.assertEqual(self.names(name="ар"),
+                         ["Ванильный сахар", "Сахар", "сахарная пудра"])
+        self.assertEqual(self.names(name="ъ"), [])
+
+    def test_new_ingredient_is_found(self):
+        self.names(name="сах")
+        Ingredient.objects.create(name="Сахарин", measurement_unit="г")
+        self.assertIn("Сахарин", self.names(name="сахари"))
@@ -0,0 +1,136 @@
+import shutil
+
+from api.cache import GENERATION_KEY, recipe_cache
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
+from recipes.catalogue import tag_catalogue
+from recipes.models import Recipe, TableVersion, Tag
+from rest_framework.test import APITestCase
+from users.models import User
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ALLOWED_HOSTS=["*"])
+class AnonymousCacheTest(APITestCase):
+    """Кеш ответов для анонимных пользователей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Author", last_name="Author", password="password",
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name="Суп", text="Описание",
+            cooking_time=10, image=png_file(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        recipe_cache().clear()
+
+    def test_default_cache_is_shared_between_processes(self):
+        self.assertNotIsInstance(recipe_cache(), (LocMemCache, DummyCache))
+
+    def test_links_follow_request_host(self):
+        for url in ("/api/recipes/?limit=1&page=1",
+                    f"/api/recipes/{self.recipe.pk}/"):
+            with self.subTest(url=url):
+                self.client.get(url, HTTP_HOST="backend")
+                response = self.client.get(
+                    url, HTTP_HOST="foodgram.example.com", secure=True
+                )
+                data = response.json()
+                recipe = data["results"][0] if "results" in data else data
+                self.assertTrue(recipe["image"].startswith(
+                    "https://foodgram.example.com/"
+                ))
+
+    def test_detail_invalidated_on_change(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        self.client.get(url)
+        self.recipe.name = "Борщ"
+        self.recipe.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Борщ")
+
+    def test_signup_and_password_change_keep_cache(self):
+        generation = recipe_cache().get(GENERATION_KEY)
+        user = User.objects.create_user(
+            email="new@example.com", username="new",
+            first_name="New", last_name="User", password="password",
+        )
+        user.set_password("another-password")
+        user.save()
+        self.author.set_password("another-password")
+        self.author.save()
+        self.assertEqual(recipe_cache().get(GENERATION_KEY), generation)
+
+    def test_author_rename_invalidates_cache(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        self.client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Renamed"
+        author.save()
+        self.assertEqual(
+            self.client.get(url).json()["author"]["first_name"], "Renamed"
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeFragmentTest(APITestCase):
+    """Фрагменты рецептов следуют за справочниками и автором"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Author", last_name="Author", password="password",
+        )
+        cls.tag = Tag.objects.create(name="Обед", slug="lunch")
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name="Суп", text="Описание",
+            cooking_time=10, image=png_file(),
+        )
+        cls.recipe.tags.add(cls.tag)
+        cls.url = f"/api/recipes/{cls.recipe.pk}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        recipe_cache().clear()
+        tag_catalogue.invalidate()
+        self.client.force_authenticate(self.author)
+
+    def rename_tag_elsewhere(self, name):
+        # Правка в другом процессе: сигналы здесь не срабатывают
+        Tag.objects.filter(pk=self.tag.pk).update(name=name)
+        TableVersion.bump(TableVersion.TAGS)
+
+    def tag_name(self):
+        return self.client.get(self.url).json()["tags"][0]["name"]
+
+    def test_fragment_follows_catalogue_version(self):
+        self.assertEqual(self.tag_name(), "Обед")
+        self.rename_tag_elsewhere("Ужин")
+        # Процесс, еще не перечитавший снимок, собирает фрагмент заново
+        # со старым именем
+        recipe_cache().clear()
+        self.assertEqual(self.tag_name(), "Обед")
+        with self.settings(CATALOGUE_CHECK_INTERVAL=0):
+            self.assertEqual(self.tag_name(), "Ужин")
+
+    def test_author_change_rebuilds_fragment(self):
+        self.client.get(self.url)
+        User.objects.filter(pk=self.author.pk).update(last_name="Renamed")
+        self.assertEqual(
+            self.client.get(self.url).json()["author"]["last_name"],
+            "Renamed",
+        )
@@ -0,0 +1,67 @@
+import shutil
+from datetime import timedelta
+
+from api.cache import recipe_cache
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.test import override_settings
+from django.utils import timezone
+from recipes.models import Recipe
+from rest_framework.test import APITestCase
+from users.models import User
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeConditionalGetTest(APITestCase):
+    """ETag и Last-Modified рецепта"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Author", last_name="Author", password="password",
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name="Суп", text="Описание",
+            cooking_time=10, image=png_file(),
+        )
+        cls.url = f"/api/recipes/{cls.recipe.pk}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        recipe_cache().clear()
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_author_rename_changes_validators(self):
+        # Last-Modified с точностью до секунды: правка в ту же секунду
+        # не отличалась бы от создания рецепта
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        response = self.client.get(self.url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        author = User.objects.get(pk=self.author.pk)
+        author.username = "renamed"
+        author.save()
+        for header in ({"HTTP_IF_NONE_MATCH": etag},
+                       {"HTTP_IF_MODIFIED_SINCE": last_modified}):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, **header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["author"]["username"],
+                                 "renamed")
+
+    def test_response_varies_by_user(self):
+        response = self.client.get(self.url)
+        vary = {value.strip() for value in response["Vary"].split(",")}
+        self.assertLessEqual({"Authorization", "Cookie"}, vary)
@@ -0,0 +1,98 @@
+import shutil
+
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.test import override_settings
+from recipes.models import FeedEntry, Recipe
+from rest_framework.test import APITestCase
+from users.models import User
+
+URL = "/api/recipes/feed/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FEED_INBOX_ENABLED=True,
+                   FEED_INBOX_MIN_FOLLOWING=1, FEED_INBOX_BACKFILL=100)
+class FeedInboxTest(APITestCase):
+    """Материализованная лента подписок"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.author, cls.other = [
+            User.objects.create_user(
+                email=f"{name}@example.com", username=name,
+                first_name=name, last_name=name, password="password",
+            )
+            for name in ("reader", "author", "other")
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, count=1):
+        return [
+            Recipe.objects.create(
+                author=author, name=f"Рецепт {index}", text="Описание",
+                cooking_time=10, image=png_file(),
+            )
+            for index in range(count)
+        ]
+
+    def subscribe(self, author):
+        response = self.client.post(f"/api/users/{author.pk}/subscribe/")
+        self.assertEqual(response.status_code, 201)
+
+    def inbox(self):
+        return set(FeedEntry.objects.filter(
+            user=self.reader
+        ).values_list("recipe_id", flat=True))
+
+    def feed_ids(self, **params):
+        ids, url = [], URL
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(recipe["id"] for recipe in data["results"])
+            url, params = data["next"], {}
+        return ids
+
+    def test_subscribe_backfills_and_create_fans_out(self):
+        old = self.publish(self.author, 2)
+        self.subscribe(self.author)
+        self.assertEqual(self.inbox(), {recipe.pk for recipe in old})
+        new = self.publish(self.author)
+        self.publish(self.other)
+        self.assertEqual(self.inbox(),
+                         {recipe.pk for recipe in old + new})
+
+    def test_unsubscribe_and_delete_clean_up(self):
+        self.subscribe(self.author)
+        self.subscribe(self.other)
+        recipes = self.publish(self.author, 2)
+        self.publish(self.other)
+        recipes[0].delete()
+        self.assertNotIn(recipes[0].pk, self.inbox())
+        response = self.client.delete(
+            f"/api/users/{self.author.pk}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        self.assertTrue(self.inbox())
+
+    def test_inbox_matches_pull_mode(self):
+        self.subscribe(self.author)
+        self.publish(self.author, 4)
+        self.subscribe(self.other)
+        self.publish(self.other, 3)
+        self.publish(self.reader, 2)
+        inbox = self.feed_ids(limit=2)
+        with self.settings(FEED_INBOX_ENABLED=False):
+            pulled = self.feed_ids(limit=2)
+        self.assertEqual(len(inbox), 7)
+        self.assertEqual(inbox, pulled)
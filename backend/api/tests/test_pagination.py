@@ -0,0 +1,77 @@
+import shutil
+from unittest import mock
+
+from api.pagination import estimate_count
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.db import connections
+from django.test import override_settings
+from recipes.models import Recipe, Tag
+from rest_framework.test import APITestCase
+from users.models import User
+
+
+class FakeCursor:
+    """Курсор psycopg2: результат EXPLAIN (FORMAT JSON) уже разобран"""
+
+    def __init__(self, row):
+        self.row = row
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return self.row
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class EstimateCountTest(APITestCase):
+    """Оценка числа рецептов для ?count=estimate"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Author", last_name="Author", password="password",
+        )
+        cls.tag = Tag.objects.create(name="Завтрак", slug="breakfast")
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {index}", text="Описание",
+                cooking_time=10, image=png_file(),
+            )
+            if index:
+                recipe.tags.add(cls.tag)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def postgresql(self, **kwargs):
+        return mock.patch.multiple(
+            connections["default"], vendor="postgresql", **kwargs
+        )
+
+    def test_filtered_plan_rows(self):
+        cursor = FakeCursor(([{"Plan": {"Plan Rows": 42}}],))
+        queryset = Recipe.objects.filter(tags__slug="breakfast")
+        with self.postgresql(cursor=lambda: cursor):
+            self.assertEqual(estimate_count(queryset), 42)
+        self.assertIn("EXPLAIN (FORMAT JSON) SELECT",
+                      " ".join(cursor.executed))
+
+    def test_failed_estimate_falls_back_to_exact_count(self):
+        # На SQLite запрос EXPLAIN (FORMAT JSON) завершается ошибкой
+        with self.postgresql():
+            response = self.client.get(
+                "/api/recipes/", {"count": "estimate", "tags": "breakfast"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
@@ -0,0 +1,96 @@
+import base64
+import shutil
+
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.test import override_settings
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APITestCase
+from users.models import User
+
+URL = "/api/recipes/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeValidationTest(APITestCase):
+    """Проверка ингредиентов и тегов при создании рецепта"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook",
+            first_name="Cook", last_name="Cook", password="password",
+        )
+        cls.tag = Tag.objects.create(name="Обед", slug="lunch")
+        cls.ingredient = Ingredient.objects.create(name="Соль",
+                                                   measurement_unit="г")
+        cls.image = "data:image/png;base64," + base64.b64encode(
+            png_file().read()
+        ).decode()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def post(self, **fields):
+        data = {
+            "name": "Суп", "text": "Описание", "cooking_time": 10,
+            "image": self.image, "tags": [self.tag.pk],
+            "ingredients": [{"id": self.ingredient.pk, "amount": 5}],
+            **fields,
+        }
+        return self.client.post(URL, data, format="json")
+
+    def assert_errors(self, response, expected):
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        for field, keys in expected.items():
+            self.assertIn(field, errors)
+            for key in keys:
+                self.assertIn(key, errors[field])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_valid_recipe_is_created(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get()
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(recipe.ingredients.get(), self.ingredient)
+
+    def test_unknown_ids(self):
+        response = self.post(
+            tags=[self.tag.pk, 999],
+            ingredients=[{"id": 999, "amount": 1}],
+        )
+        self.assert_errors(response, {"ingredients": ["not_found"],
+                                      "tags": ["not_found"]})
+        self.assertEqual(response.json()["tags"]["not_found"], ["999"])
+
+    def test_duplicates(self):
+        response = self.post(
+            tags=[self.tag.pk, self.tag.pk],
+            ingredients=[{"id": self.ingredient.pk, "amount": 1},
+                         {"id": self.ingredient.pk, "amount": 2}],
+        )
+        self.assert_errors(response, {"ingredients": ["duplicates"],
+                                      "tags": ["duplicates"]})
+
+    def test_malformed_types(self):
+        cases = [
+            ({"tags": 5}, {"tags": []}),
+            ({"ingredients": "x"}, {"ingredients": []}),
+            ({"tags": 5, "ingredients": {"id": 1}},
+             {"tags": [], "ingredients": []}),
+            ({"tags": ["x", 1.5, True, [1]]}, {"tags": ["invalid"]}),
+            ({"ingredients": [5, "x"]}, {"ingredients": ["invalid"]}),
+            ({"ingredients": [{"id": [1], "amount": 1}]},
+             {"ingredients": ["invalid"]}),
+            ({"ingredients": [{"id": self.ingredient.pk, "amount": "x"}]},
+             {"ingredients": ["invalid_amount"]}),
+        ]
+        for fields, expected in cases:
+            with self.subTest(fields=fields):
+                self.assert_errors(self.post(**fields), expected)
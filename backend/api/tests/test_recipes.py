@@ -0,0 +1,104 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipes.models import (Follow, Ingredient, IngredientRecipes, Recipe,
+                            RecipeFavorites, ShoppingList, Tag)
+from rest_framework.test import APITestCase
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix="foodgram-tests-")
+
+
+def png_file(name="recipe.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeListQueriesTest(APITestCase):
+    """Число запросов списка рецептов не зависит от размера страницы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email="reader@example.com", username="reader",
+            first_name="Reader", last_name="Reader", password="password",
+        )
+        authors = [
+            User.objects.create_user(
+                email=f"author{index}@example.com",
+                username=f"author{index}", first_name="Author",
+                last_name=str(index), password="password",
+            )
+            for index in range(5)
+        ]
+        tags = [
+            Tag.objects.create(name=f"Тег {index}", slug=f"tag{index}")
+            for index in range(3)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(10)
+        )
+        ingredients = list(Ingredient.objects.order_by("id"))
+        for index in range(60):
+            recipe = Recipe.objects.create(
+                author=authors[index % len(authors)],
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+                image=png_file(),
+            )
+            recipe.tags.set(tags[:index % len(tags) + 1])
+            IngredientRecipes.objects.bulk_create(
+                IngredientRecipes(recipes=recipe, ingredients=ingredient,
+                                  amount=index + 1)
+                for ingredient in ingredients[index % 5:index % 5 + 3]
+            )
+            if index % 2:
+                RecipeFavorites.objects.create(user=cls.reader,
+                                               recipes=recipe)
+            if index % 3:
+                ShoppingList.objects.create(user=cls.reader, recipes=recipe)
+        Follow.objects.create(user=cls.reader, author=authors[0])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        # Первый запрос загружает справочники тегов и ингредиентов
+        self.client.get("/api/recipes/?limit=50")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/?limit=6")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 6)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get("/api/recipes/?limit=50")
+        self.assertEqual(len(response.data["results"]), 50)
+
+    def test_user_flags(self):
+        response = self.client.get("/api/recipes/?limit=50")
+        for item in response.data["results"]:
+            recipe = Recipe.objects.get(pk=item["id"])
+            self.assertEqual(
+                item["is_favorited"],
+                recipe.recipefavorites_set.filter(user=self.reader).exists(),
+            )
+            self.assertEqual(
+                item["is_in_shopping_cart"],
+                recipe.shoppinglist_set.filter(user=self.reader).exists(),
+            )
+            self.assertEqual(item["author"]["is_subscribed"],
+                             recipe.author.username == "author0")
@@ -0,0 +1,56 @@
+import shutil
+
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.test import override_settings
+from recipes.models import Ingredient, IngredientRecipes, Recipe, ShoppingList
+from rest_framework.test import APITestCase
+from users.models import User
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DownloadShoppingCartTest(APITestCase):
+    """Выгрузка списка покупок и ответы об ошибках"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="buyer@example.com", username="buyer",
+            first_name="Buyer", last_name="Buyer", password="password",
+        )
+        ingredient = Ingredient.objects.create(name="Мука",
+                                               measurement_unit="г")
+        for amount in (100, 250):
+            recipe = Recipe.objects.create(
+                author=cls.user, name="Блины", text="Описание",
+                cooking_time=10, image=png_file(),
+            )
+            IngredientRecipes.objects.create(
+                recipes=recipe, ingredients=ingredient, amount=amount
+            )
+            ShoppingList.objects.create(user=cls.user, recipes=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_anonymous_gets_401(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("detail", response.json())
+
+    def test_unknown_format_gets_404(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(URL, {"format": "xml"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_text_export_sums_amounts(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(URL, {"format": "txt"})
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content, "Мука - 350 г\n")
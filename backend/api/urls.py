@@ -1,5 +1,6 @@
 from api.views import (FollowViewSet,
                        IngredientsViewSet,
+                       MetricsView,
                        RecipeFavoritesViewSet,
                        RecipeViewSet,
                        ShoppingViewSet,
@@ -20,6 +21,7 @@ router.register("recipes", RecipeViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("", include("djoser.urls")),
     re_path(r"^auth/", include("djoser.urls.authtoken")),
     path(
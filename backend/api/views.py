@@ -1,7 +1,15 @@
 import drf_yasg.utils
+from api.cache import AnonymousCacheMixin, cache_stats
+from api.conditional import (recipe_etag, recipe_last_modified, table_etag,
+                             table_last_modified)
 from api.filters import IngredientSearchFilter, RecipesFilter
-from api.pagination import CustomPagination
+from api.pagination import CustomPagination, RecipeCursorPagination
 from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.renderers import (ShoppingCartCSVRenderer,
+                           ShoppingCartJSONRenderer,
+                           ShoppingCartPDFRenderer,
+                           ShoppingCartTextRenderer
+                           )
 from api.serializers import (FollowSerializer,
                              IngredientSerializer,
                              RecipeFavoritesSerializer,
@@ -9,10 +17,20 @@ from api.serializers import (FollowSerializer,
                              ShoppingListSerializer,
                              TagSerializer
                              )
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from drf_yasg.utils import swagger_auto_schema
+from foodgram.constants import (INGREDIENT_AUTOCOMPLETE_LIMIT,
+                                INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+from foodgram.db import connection_stats
+from foodgram.middleware import SerializationMetricsMixin
+from recipes.catalogue import ingredient_catalogue
+from recipes.feed import feed_queryset
 from recipes.models import (User,
                             Follow,
                             Ingredient,
@@ -20,15 +38,33 @@ from recipes.models import (User,
                             Recipe,
                             RecipeFavorites,
                             ShoppingList,
+                            TableVersion,
                             Tag
                             )
+from recipes.scores import RANKINGS
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+tags_condition = condition(
+    etag_func=table_etag(TableVersion.TAGS),
+    last_modified_func=table_last_modified(TableVersion.TAGS),
+)
+ingredients_condition = condition(
+    etag_func=table_etag(TableVersion.INGREDIENTS),
+    last_modified_func=table_last_modified(TableVersion.INGREDIENTS),
+)
+recipe_condition = [
+    condition(etag_func=recipe_etag, last_modified_func=recipe_last_modified),
+    vary_on_headers("Authorization", "Cookie"),
+]
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+@method_decorator(name="list", decorator=tags_condition)
+@method_decorator(name="retrieve", decorator=tags_condition)
+class TagViewSet(SerializationMetricsMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet Тег
     Получение списка тегов /
     конкретного тега
@@ -37,9 +73,14 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAdminOrReadOnly]
+    replica_actions = ("list", "retrieve")
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(name="list", decorator=ingredients_condition)
+@method_decorator(name="retrieve", decorator=ingredients_condition)
+@method_decorator(name="autocomplete", decorator=ingredients_condition)
+class IngredientsViewSet(SerializationMetricsMixin,
+                         viewsets.ReadOnlyModelViewSet):
     """ViewSet Ингредиенты
     Получение списка ингредиентов /
     конкретного ингредиента
@@ -50,8 +91,31 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [IngredientSearchFilter]
     search_fields = ["^name"]
+    replica_actions = ("list", "retrieve", "autocomplete")
+
+    @action(methods=["GET"], detail=False)
+    def autocomplete(self, request):
+        """Автодополнение названия ингредиента:
+        сначала совпадения по началу названия, затем по вхождению.
+        Ответ собирается из справочника в памяти процесса
+        """
+        try:
+            limit = min(
+                int(request.query_params.get(
+                    "limit", INGREDIENT_AUTOCOMPLETE_LIMIT
+                )),
+                INGREDIENT_AUTOCOMPLETE_MAX_LIMIT,
+            )
+        except ValueError:
+            limit = INGREDIENT_AUTOCOMPLETE_LIMIT
+        ingredients = ingredient_catalogue.autocomplete(
+            request.query_params.get("name", ""), max(limit, 1)
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
 
 
+@method_decorator(name="retrieve", decorator=recipe_condition)
 @method_decorator(
     name="create",
     decorator=swagger_auto_schema(
@@ -84,7 +148,8 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, SerializationMetricsMixin,
+                    viewsets.ModelViewSet):
     """ViewSet Рецепт
     Получение списка рецептов /
     конкретного рецепта /
@@ -97,38 +162,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
     filterset_class = RecipesFilter
     permission_classes = [IsOwnerOrReadOnly]
+    replica_actions = ("list", "retrieve", "feed")
 
+    @property
+    def paginator(self):
+        """?pagination=cursor включает курсорную пагинацию
+        для бесконечной ленты
+        """
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if (request is not None
+                    and request.query_params.get("pagination") == "cursor"):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
+        ordering = self.request.query_params.get("ordering")
+        if self.action == "list" and ordering in RANKINGS:
+            return queryset.ranked_by(ordering)
+        return queryset
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        author_id = instance.author_id
+        instance.delete()
+        User.objects.filter(pk=author_id).update(
+            recipes_count=F("recipes_count") - 1
+        )
 
     @action(methods=["GET"], detail=False,
             permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Лента рецептов авторов из подписок пользователя
+        с курсорной пагинацией
+        """
+        queryset = self.filter_queryset(
+            feed_queryset(self.get_queryset(), request.user)
+        )
+        paginator = RecipeCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=["GET"], detail=False,
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[ShoppingCartTextRenderer,
+                              ShoppingCartCSVRenderer,
+                              ShoppingCartJSONRenderer,
+                              ShoppingCartPDFRenderer])
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок"""
-        shopping_result = {}
+        """Скачивание списка покупок.
+        Формат выбирается параметром ?format=txt|csv|json|pdf
+        """
         ingredients = IngredientRecipes.objects.filter(
             recipes__shoppinglist__user=request.user
-        ).values_list("ingredients__name",
-                      "ingredients__measurement_unit",
-                      "amount")
-
-        for ingredient in ingredients:
-            name = ingredient[0]
-            if name not in shopping_result:
-                shopping_result[name] = {
-                    "measurement_unit": ingredient[1],
-                    "amount": ingredient[2],
-                }
-            else:
-                shopping_result[name]["amount"] += ingredient[2]
-
-        shopping_itog = (
-            f"{name} - {value['amount']} " f"{value['measurement_unit']}\n"
-            for name, value in shopping_result.items()
+        ).values(
+            "ingredients__name", "ingredients__measurement_unit"
+        ).annotate(
+            total_amount=Sum("amount")
+        ).order_by("ingredients__name", "ingredients__measurement_unit")
+        rows = (
+            {
+                "name": ingredient["ingredients__name"],
+                "measurement_unit":
+                    ingredient["ingredients__measurement_unit"],
+                "amount": ingredient["total_amount"],
+            }
+            for ingredient in ingredients.iterator()
+        )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        if "wsgi.version" not in request.META:
+            # ASGI-обработчик Django 3.2 перебирает потоковый ответ в цикле
+            # событий, где запросы к базе запрещены: сгруппированные строки
+            # (не больше числа ингредиентов) выбираются здесь, а файл
+            # по-прежнему формируется и отдается частями
+            rows = list(rows)
+        response = StreamingHttpResponse(
+            renderer.stream(rows), content_type=content_type
         )
-        response = HttpResponse(shopping_itog, content_type="text/plain")
         response["Content-Disposition"] = \
-            'attachment; filename="shoppinglist.txt"'
+            f'attachment; filename="shoppinglist.{renderer.format}"'
         return response
 
 
@@ -149,7 +277,11 @@ class RecipeFavoritesViewSet(viewsets.ModelViewSet):
         """
         recipes_id = self.kwargs["id"]
         recipes = get_object_or_404(Recipe, id=recipes_id)
-        RecipeFavorites.objects.create(user=request.user, recipes=recipes)
+        with transaction.atomic():
+            RecipeFavorites.objects.create(user=request.user, recipes=recipes)
+            Recipe.objects.filter(pk=recipes.pk).update(
+                favorites_count=F("favorites_count") + 1
+            )
         serializer = RecipeFavoritesSerializer()
         return Response(
             serializer.to_representation(instance=recipes),
@@ -162,9 +294,14 @@ class RecipeFavoritesViewSet(viewsets.ModelViewSet):
         """
         recipes_id = self.kwargs["id"]
         user_id = request.user.id
-        RecipeFavorites.objects.filter(
-            user__id=user_id, recipes__id=recipes_id
-        ).delete()
+        with transaction.atomic():
+            deleted, _ = RecipeFavorites.objects.filter(
+                user__id=user_id, recipes__id=recipes_id
+            ).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipes_id).update(
+                    favorites_count=F("favorites_count") - deleted
+                )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -191,7 +328,7 @@ class FollowViewSet(viewsets.ModelViewSet):
         """Удаление подписки"""
         author_id = self.kwargs["id"]
         user_id = request.user.id
-        Follow.objects.filter(user_id, author_id).delete()
+        Follow.objects.filter(user_id=user_id, author_id=author_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -214,7 +351,11 @@ class ShoppingViewSet(viewsets.ModelViewSet):
         """
         recipe_id = self.kwargs["id"]
         recipes = get_object_or_404(Recipe, id=recipe_id)
-        ShoppingList.objects.create(user=request.user, recipes=recipes)
+        with transaction.atomic():
+            ShoppingList.objects.create(user=request.user, recipes=recipes)
+            Recipe.objects.filter(pk=recipes.pk).update(
+                in_carts_count=F("in_carts_count") + 1
+            )
         serializer = ShoppingListSerializer()
         return Response(
             serializer.to_representation(instance=recipes),
@@ -227,6 +368,30 @@ class ShoppingViewSet(viewsets.ModelViewSet):
         """
         recipe_id = self.kwargs["id"]
         user_id = request.user.id
-        ShoppingList.objects.filter(user__id=user_id,
-                                    recipes__id=recipe_id).delete()
+        with transaction.atomic():
+            deleted, _ = ShoppingList.objects.filter(
+                user__id=user_id, recipes__id=recipe_id
+            ).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe_id).update(
+                    in_carts_count=F("in_carts_count") - deleted
+                )
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Метрики приложения в текстовом формате Prometheus"""
+
+    permission_classes = [IsAdminUser]
+    swagger_schema = None
+
+    def get(self, request):
+        metrics = {
+            f"foodgram_recipes_cache_{name}_total": value
+            for name, value in cache_stats().items()
+        }
+        metrics.update(connection_stats())
+        return HttpResponse(
+            "".join(f"{name} {value}\n" for name, value in metrics.items()),
+            content_type="text/plain; version=0.0.4",
+        )
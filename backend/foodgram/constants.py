@@ -3,3 +3,29 @@ COLOR_CHARS_MAX_LENGTH = 7
 POSITIVE_SMALL_MIN_VALUE = 1
 POSITIVE_SMALL_MAX_VALUE = 32000
 MAX_LENGTH_VALUE = 150
+INGREDIENT_AUTOCOMPLETE_LIMIT = 10
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 50
+RECIPE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 4096
+# Варианты изображения рецепта: название -> (длинная сторона, формат)
+RECIPE_IMAGE_VARIANTS = {
+    "card": (600, "JPEG"),
+    "card_webp": (600, "WEBP"),
+    "detail": (1200, "JPEG"),
+    "detail_webp": (1200, "WEBP"),
+}
+RECIPE_IMAGE_QUALITY = 82
+RECIPE_SCORE_WEIGHTS = {
+    "favorite": 2.0,
+    "shopping_cart": 1.0,
+}
+# Период полураспада рейтингов в секундах
+RECIPE_SCORE_HALF_LIFE = {
+    "popular": 30 * 24 * 60 * 60,
+    "trending": 24 * 60 * 60,
+}
+RECIPE_SCORE_BATCH_SIZE = 1000
+# Рейтинги пересчитываются на момент на столько секунд раньше текущего:
+# события, чья транзакция зафиксирована позже created_at, успевают попасть
+# в окно пересчета
+RECIPE_SCORE_COMMIT_DELAY = 60
@@ -0,0 +1,23 @@
+import os
+from collections import Counter
+
+# Счетчики соединений с базой в текущем процессе
+stats = Counter()
+# Пулы соединений по алиасу базы
+pools = {}
+
+
+def connection_stats():
+    """Метрики соединений процесса для /api/metrics/"""
+    labels = f'pid="{os.getpid()}"'
+    metrics = {
+        f"foodgram_db_connections_opened_total{{{labels}}}":
+            stats["opened"],
+        f"foodgram_db_health_check_failures_total{{{labels}}}":
+            stats["health_check_failures"],
+    }
+    for alias, pool in pools.items():
+        pool_labels = f'{labels},alias="{alias}"'
+        for name, value in pool.metrics().items():
+            metrics[f"foodgram_db_pool_{name}{{{pool_labels}}}"] = value
+    return metrics
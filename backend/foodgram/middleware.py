@@ -0,0 +1,273 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from foodgram import routers
+
+logger = logging.getLogger("foodgram.requests")
+slow_logger = logging.getLogger("foodgram.requests.slow")
+
+FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(sql):
+    """Текст запроса без значений параметров:
+    одинаковые по форме запросы дают одинаковый отпечаток
+    """
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    """Обертка connection.execute_wrapper, запоминающая
+    текст и длительность каждого запроса к базе
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def fingerprints(self):
+        """Отпечатки запросов: (отпечаток, количество, время),
+        от самых затратных к менее затратным
+        """
+        counts, durations = Counter(), defaultdict(float)
+        for sql, duration in self.queries:
+            key = fingerprint(sql)
+            counts[key] += 1
+            durations[key] += duration
+        return sorted(
+            ((key, counts[key], durations[key]) for key in counts),
+            key=lambda item: item[2], reverse=True,
+        )
+
+
+def measure_serialization(request, serializer):
+    """Учитывает время to_representation сериализатора верхнего
+    уровня (serializer.data) в метриках запроса
+    """
+    timings = getattr(request, "_metrics_serialize", None)
+    if timings is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed(instance):
+        started = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            timings[0] += time.perf_counter() - started
+
+    serializer.to_representation = timed
+    return serializer
+
+
+class SerializationMetricsMixin:
+    """Время сериализаторов вьюсета попадает в метрики запроса"""
+
+    def get_serializer(self, *args, **kwargs):
+        return measure_serialization(
+            self.request, super().get_serializer(*args, **kwargs)
+        )
+
+
+def recording(recorder):
+    """Запоминает запросы ко всем базам текущего потока"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+class RequestMetricsMiddleware:
+    """Замеряет для каждого запроса число и время SQL-запросов,
+    время сериализации и рендеринга ответа и его размер.
+    Отдает заголовок Server-Timing, пишет строку JSON в лог
+    foodgram.requests, медленные запросы с отпечатками SQL
+    и подозрения на N+1 — в foodgram.requests.slow.
+    Потоковый ответ замеряется вместе с отдачей содержимого,
+    заголовок Server-Timing у него не ставится
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request._metrics_render = [None, None]
+        request._metrics_serialize = [0.0]
+        started = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, recorder, started,
+                response.streaming_content,
+            )
+            return response
+        total = time.perf_counter() - started
+        self.report(request, response, recorder, total)
+        return response
+
+    def stream(self, request, response, recorder, started, content):
+        """Отдает содержимое, учитывая запросы к базе во время
+        итерации, и пишет метрики после последнего фрагмента
+        """
+        size = 0
+        try:
+            with recording(recorder):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.report(request, response, recorder,
+                        time.perf_counter() - started, size)
+
+    def process_template_response(self, request, response):
+        """Рендеринг TemplateResponse и Response DRF выполняется
+        после этого метода, его конец отмечает post-render callback
+        """
+        render = getattr(request, "_metrics_render", None)
+        if render is not None:
+            render[0] = time.perf_counter()
+
+            def rendered(response):
+                render[1] = time.perf_counter()
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, recorder, total, size=None):
+        started, finished = request._metrics_render
+        render = finished - started if started and finished else 0.0
+        serialize = request._metrics_serialize[0]
+        db = recorder.duration
+        match = request.resolver_match
+        if not response.streaming:
+            size = len(response.content)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(db * 1000, 2),
+            "serialize_ms": round(serialize * 1000, 2),
+            "render_ms": round(render * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "size": size,
+        }
+        fingerprints = None
+        if recorder.count >= settings.REQUEST_N_PLUS_ONE_THRESHOLD:
+            fingerprints = recorder.fingerprints()
+            repeated = [
+                key for key, count, _ in fingerprints
+                if count >= settings.REQUEST_N_PLUS_ONE_THRESHOLD
+            ]
+            if repeated:
+                record["n_plus_one"] = repeated
+        if settings.REQUEST_METRICS_SERVER_TIMING and not response.streaming:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={db * 1000:.2f};desc="{recorder.count} queries"',
+                f"serialize;dur={serialize * 1000:.2f}",
+                f"render;dur={render * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            ])
+        logger.info(json.dumps(record, ensure_ascii=False))
+        slow = (total * 1000 >= settings.REQUEST_SLOW_MS
+                or recorder.count >= settings.REQUEST_SLOW_QUERIES)
+        if ((slow or "n_plus_one" in record)
+                and random.random() < settings.REQUEST_SLOW_SAMPLE_RATE):
+            record["sql"] = [
+                {"fingerprint": key, "count": count,
+                 "ms": round(duration * 1000, 2)}
+                for key, count, duration in (
+                    fingerprints or recorder.fingerprints()
+                )[:settings.REQUEST_SLOW_MAX_FINGERPRINTS]
+            ]
+            slow_logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтение безопасных запросов к действиям вьюсетов
+    из атрибута replica_actions на реплику. После успешной записи
+    пользователь на время прилипает к основной базе. Если реплика
+    отстает или недоступна, запрос читает с основной базы
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.REPLICA_DATABASES:
+            routers.check_sticky_cache()
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        token = routers.read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.read_alias.reset(token)
+        if (request.method not in ("GET", "HEAD", "OPTIONS")
+                and response.status_code < 400):
+            routers.mark_sticky(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.REPLICA_DATABASES or request.method not in (
+            "GET", "HEAD"
+        ):
+            return
+        actions = getattr(view_func, "actions", None) or {}
+        replica_actions = getattr(
+            getattr(view_func, "cls", None), "replica_actions", ()
+        )
+        if actions.get("get") not in replica_actions:
+            return
+        if routers.is_sticky(request):
+            return
+        alias = routers.choose_replica()
+        if alias is not None:
+            routers.read_alias.set(alias)
+            request.replica_view = (view_func, view_args, view_kwargs)
+
+    def process_exception(self, request, exception):
+        """Ошибка базы на реплике: реплика исключается из выбора,
+        безопасный запрос повторяется на основной базе
+        """
+        alias = routers.read_alias.get()
+        if alias is None or not isinstance(exception, DatabaseError):
+            return None
+        routers.mark_unhealthy(alias)
+        connections[alias].close()
+        routers.read_alias.set(None)
+        view_func, view_args, view_kwargs = request.replica_view
+        return view_func(request, *view_args, **view_kwargs)
@@ -0,0 +1,170 @@
+"""Бэкенд PostgreSQL с проверкой живости постоянных соединений
+и необязательным пулом соединений в процессе.
+Подключается через ENGINE = "foodgram.postgresql"
+"""
+import threading
+from collections import Counter
+
+import psycopg2.extensions
+import psycopg2.extras
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from foodgram.db import pools, stats
+
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Пул соединений psycopg2 на весь процесс.
+    Свободные соединения выдаются в порядке LIFO, при исчерпании
+    пула запрос ждет освобождения не дольше timeout секунд
+    """
+
+    def __init__(self, conn_params, size, timeout):
+        self.conn_params = conn_params
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._counts = Counter()
+
+    def acquire(self, check=None):
+        """Выдает соединение из пула. Свободное соединение перед выдачей
+        проверяется функцией check, не прошедшее проверку заменяется
+        новым. Только что открытые соединения не проверяются
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            self._counts["timeouts_total"] += 1
+            raise OperationalError(
+                f"Пул соединений исчерпан: {self.size} соединений заняты "
+                f"дольше {self.timeout} с"
+            )
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if (connection is not None and not connection.closed
+                    and check is not None and not check(connection)):
+                stats["health_check_failures"] += 1
+                connection.close()
+            if connection is None or connection.closed:
+                connection = psycopg2.connect(**self.conn_params)
+                stats["opened"] += 1
+                self._counts["opened_total"] += 1
+            else:
+                self._counts["reused_total"] += 1
+        except Exception:
+            self._slots.release()
+            raise
+        self._counts["in_use"] += 1
+        return connection
+
+    def release(self, connection):
+        """Возвращает соединение в пул, незавершенная транзакция
+        откатывается, сломанное соединение закрывается
+        """
+        try:
+            if not connection.closed:
+                status = connection.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    connection.close()
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+        except psycopg2.Error:
+            connection.close()
+        with self._lock:
+            if not connection.closed:
+                self._idle.append(connection)
+            self._counts["in_use"] -= 1
+        self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                **self._counts,
+            }
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Соединения открываются из пула при POOL_SIZE > 0
+    в настройках базы. При HEALTH_CHECKS постоянное соединение
+    проверяется SELECT 1 при первом использовании в каждом запросе
+    """
+
+    health_check_done = False
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get("POOL_SIZE") or 0
+        if size <= 0:
+            return None
+        pool = pools.get(self.alias)
+        if pool is None:
+            with pools_lock:
+                pool = pools.get(self.alias)
+                if pool is None:
+                    pool = ConnectionPool(
+                        self.get_connection_params(), size,
+                        self.settings_dict.get("POOL_TIMEOUT", 10),
+                    )
+                    pools[self.alias] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        self.health_check_done = True
+        pool = self.pool
+        if pool is None:
+            stats["opened"] += 1
+            return super().get_new_connection(conn_params)
+        connection = pool.acquire(
+            self._ping if self.settings_dict.get("HEALTH_CHECKS") else None
+        )
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get(
+            "isolation_level", connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection, self.connection = self.connection, None
+        return pool.release(connection)
+
+    @staticmethod
+    def _ping(connection):
+        """SELECT 1 вне транзакции: без autocommit запрос открывает
+        транзакцию, в которой нельзя менять autocommit и set_session
+        """
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def ensure_connection(self):
+        if (self.connection is not None
+                and self.settings_dict.get("HEALTH_CHECKS")
+                and not self.health_check_done
+                and not self.in_atomic_block):
+            if not self._ping(self.connection):
+                stats["health_check_failures"] += 1
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается Django в начале и конце каждого запроса
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Алиас реплики для чтения в текущем запросе, None — основная база
+read_alias = ContextVar("read_alias", default=None)
+
+STICKY_KEY = "replica:sticky:{}"
+LAG_SQL = {
+    "postgresql": (
+        "SELECT COALESCE(EXTRACT(EPOCH FROM "
+        "now() - pg_last_xact_replay_timestamp()), 0)"
+    ),
+}
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Чтение внутри помеченных запросов идет на реплику,
+    выбранную ReplicaRoutingMiddleware, все остальное — на default.
+    Токены всегда читаются с основной базы: только что выданный
+    токен мог еще не дойти до реплики
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == "authtoken":
+            return None
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def sticky_key(request):
+    """Ключ прилипания к основной базе по заголовку Authorization,
+    None для анонимных запросов
+    """
+    authorization = request.META.get("HTTP_AUTHORIZATION")
+    if not authorization:
+        return None
+    return STICKY_KEY.format(
+        hashlib.sha256(authorization.encode()).hexdigest()
+    )
+
+
+def check_sticky_cache():
+    """Метка прилипания должна быть видна всем воркерам: с кешем
+    в памяти процесса запрос после записи попадает в другой воркер
+    и читает с реплики
+    """
+    alias = settings.REPLICA_STICKY_CACHE
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"REPLICA_STICKY_CACHE='{alias}' хранится в памяти процесса. "
+            "С репликами нужен общий для воркеров кеш: "
+            "FileBasedCache, memcached или Redis"
+        )
+
+
+def mark_sticky(request):
+    """После записи чтения пользователя REPLICA_STICKY_SECONDS
+    идут на основную базу, чтобы он видел свои изменения
+    """
+    key = sticky_key(request)
+    if key is not None:
+        caches[settings.REPLICA_STICKY_CACHE].set(
+            key, True, settings.REPLICA_STICKY_SECONDS
+        )
+
+
+def is_sticky(request):
+    key = sticky_key(request)
+    return key is not None and bool(
+        caches[settings.REPLICA_STICKY_CACHE].get(key)
+    )
+
+
+def check_replica(alias):
+    """Доступна ли реплика и не отстает ли она больше REPLICA_MAX_LAG"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL.get(connection.vendor, "SELECT 0"))
+            lag = float(cursor.fetchone()[0] or 0)
+    except DatabaseError as error:
+        logger.warning("Реплика %s недоступна: %s", alias, error)
+        connection.close()
+        return False
+    if lag > settings.REPLICA_MAX_LAG:
+        logger.warning("Реплика %s отстает на %.1f с", alias, lag)
+        return False
+    return True
+
+
+def mark_unhealthy(alias):
+    """Исключает реплику из выбора до следующей проверки"""
+    with _health_lock:
+        _health[alias] = (False, time.monotonic())
+
+
+def healthy_replicas():
+    """Реплики, прошедшие проверку. Результат проверки каждой
+    реплики хранится в процессе REPLICA_CHECK_INTERVAL секунд
+    """
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.REPLICA_DATABASES:
+        with _health_lock:
+            state = _health.get(alias)
+        if state is None or now - state[1] > settings.REPLICA_CHECK_INTERVAL:
+            state = (check_replica(alias), now)
+            with _health_lock:
+                _health[alias] = state
+        if state[0]:
+            healthy.append(alias)
+    return healthy
+
+
+def choose_replica():
+    replicas = healthy_replicas()
+    return random.choice(replicas) if replicas else None
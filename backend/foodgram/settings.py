@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -79,6 +81,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Пул соединений в процессе (ENGINE foodgram.postgresql), 0 — без пула.
+# С пулом соединение возвращается в него в конце каждого запроса
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+# PgBouncer в режиме transaction: серверные курсоры (.iterator())
+# не переживают смену серверного соединения между транзакциями
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False') == 'True'
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE'),
@@ -86,10 +95,48 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': (0 if DB_POOL_SIZE
+                         else int(os.getenv('DB_CONN_MAX_AGE', 60))),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        # Ключи ниже читает только бэкенд foodgram.postgresql
+        'HEALTH_CHECKS': os.getenv('DB_HEALTH_CHECKS', 'True') == 'True',
+        'POOL_SIZE': DB_POOL_SIZE,
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
     }
 }
 
+# Реплики для чтения: хосты и/или имена баз через запятую.
+# Для локальной проверки на SQLite достаточно DB_REPLICA_NAMES
+# с путями к копиям файла базы
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+DB_REPLICA_NAMES = [
+    name for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name
+]
+for index in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    DATABASES[f'replica{index + 1}'] = {
+        **DATABASES['default'],
+        'HOST': (DB_REPLICA_HOSTS[index] if DB_REPLICA_HOSTS
+                 else DATABASES['default']['HOST']),
+        'NAME': (DB_REPLICA_NAMES[index] if DB_REPLICA_NAMES
+                 else DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+# Кеш меток прилипания, общий для всех воркеров. С репликами
+# LocMemCache не подходит: каждый процесс видит только свои метки
+REPLICA_STICKY_CACHE = os.getenv('REPLICA_STICKY_CACHE', 'recipes')
+# Допустимое отставание реплики и интервал его проверки, секунды
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+# Время жизни в кеше ответов, прочитанных с реплики
+REPLICA_CACHE_TIMEOUT = int(os.getenv('REPLICA_CACHE_TIMEOUT', 30))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -139,6 +186,101 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Потоки фоновой обработки изображений рецептов, 0 — обработка
+# синхронно после фиксации транзакции
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кеш ответов API рецептов для анонимных пользователей.
+    # Сброс по сигналам должен доходить до всех воркеров, поэтому кеш
+    # общий: по умолчанию файловый, в продакшене можно memcached.
+    # LocMemCache годится только для одного процесса
+    'recipes': {
+        'BACKEND': os.getenv(
+            'RECIPES_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'RECIPES_CACHE_LOCATION', '/var/tmp/foodgram_cache'
+        ),
+        'TIMEOUT': int(os.getenv('RECIPES_CACHE_TIMEOUT', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RECIPES_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
+RECIPES_CACHE_ALIAS = 'recipes'
+RECIPES_CACHE_LIST_PARAMS = (
+    'tags', 'author', 'page', 'limit', 'pagination', 'cursor', 'count',
+    'ordering', 'ingredients', 'ingredients_all', 'search',
+)
+
+# Сколько хранятся готовые представления рецептов без данных
+# пользователя, секунды. Фрагмент сбрасывается при изменении рецепта,
+# справочников и автора; срок не больше RECIPES_FRAGMENT_MAX_TIMEOUT
+RECIPES_FRAGMENT_MAX_TIMEOUT = 3600
+RECIPES_FRAGMENT_TIMEOUT = min(
+    int(os.getenv('RECIPES_FRAGMENT_TIMEOUT', RECIPES_FRAGMENT_MAX_TIMEOUT)),
+    RECIPES_FRAGMENT_MAX_TIMEOUT,
+)
+
+# Как часто процесс сверяет свои справочники тегов и ингредиентов
+# с версией таблиц в базе, секунды
+CATALOGUE_CHECK_INTERVAL = float(os.getenv('CATALOGUE_CHECK_INTERVAL', 5))
+
+# Конфигурация полнотекстового поиска PostgreSQL
+RECIPES_SEARCH_CONFIG = os.getenv('RECIPES_SEARCH_CONFIG', 'russian')
+
+
+# Материализованная лента подписок: рецепты раскладываются по подписчикам
+# при публикации и читаются из нее у пользователей с большим числом подписок
+FEED_INBOX_ENABLED = os.getenv('FEED_INBOX_ENABLED', 'False') == 'True'
+FEED_INBOX_MIN_FOLLOWING = int(os.getenv('FEED_INBOX_MIN_FOLLOWING', 500))
+FEED_INBOX_BACKFILL = int(os.getenv('FEED_INBOX_BACKFILL', 100))
+FEED_INBOX_BATCH_SIZE = 1000
+
+
+# Замеры запросов: число и время SQL, рендеринг, размер ответа
+REQUEST_METRICS_ENABLED = os.getenv(
+    'REQUEST_METRICS_ENABLED', 'True') == 'True'
+REQUEST_METRICS_SERVER_TIMING = os.getenv(
+    'REQUEST_METRICS_SERVER_TIMING', 'True') == 'True'
+# Пороги медленного запроса и доля медленных запросов,
+# попадающих в лог вместе с отпечатками SQL
+REQUEST_SLOW_MS = int(os.getenv('REQUEST_SLOW_MS', 500))
+REQUEST_SLOW_QUERIES = int(os.getenv('REQUEST_SLOW_QUERIES', 30))
+REQUEST_SLOW_SAMPLE_RATE = float(os.getenv('REQUEST_SLOW_SAMPLE_RATE', 1.0))
+REQUEST_SLOW_MAX_FINGERPRINTS = 20
+# Столько одинаковых по форме запросов за один HTTP-запрос — признак N+1
+REQUEST_N_PLUS_ONE_THRESHOLD = int(
+    os.getenv('REQUEST_N_PLUS_ONE_THRESHOLD', 10))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['requests'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -179,3 +321,8 @@ DJOSER = {
 }
 
 CSV_FILES_DIR = os.path.join(BASE_DIR, 'data')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
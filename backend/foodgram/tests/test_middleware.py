@@ -0,0 +1,61 @@
+import json
+import shutil
+
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.test import override_settings
+from recipes.models import Ingredient, IngredientRecipes, Recipe, ShoppingList
+from rest_framework.test import APITestCase
+from users.models import User
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, REQUEST_METRICS_ENABLED=True,
+                   REQUEST_METRICS_SERVER_TIMING=True)
+class RequestMetricsTest(APITestCase):
+    """Метрики запросов в логе foodgram.requests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="cook@example.com", username="cook",
+            first_name="Cook", last_name="Cook", password="password",
+        )
+        ingredient = Ingredient.objects.create(name="Мука",
+                                               measurement_unit="г")
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f"Рецепт {index}", text="Описание",
+                cooking_time=10, image=png_file(),
+            )
+            IngredientRecipes.objects.create(
+                recipes=recipe, ingredients=ingredient, amount=100
+            )
+            ShoppingList.objects.create(user=cls.user, recipes=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_serializer_time_is_reported(self):
+        with self.assertLogs("foodgram.requests", "INFO") as logs:
+            response = self.client.get("/api/recipes/")
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertGreater(record["serialize_ms"], 0)
+        self.assertGreater(record["queries"], 0)
+        self.assertIn("serialize;dur=", response["Server-Timing"])
+
+    def test_streaming_response_counts_queries_while_iterating(self):
+        with self.assertLogs("foodgram.requests", "INFO") as logs:
+            response = self.client.get(
+                "/api/recipes/download_shopping_cart/", {"format": "txt"}
+            )
+            self.assertEqual(logs.records, [])
+            content = b"".join(response.streaming_content)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(content.decode(), "Мука - 300 г\n")
+        self.assertGreater(record["queries"], 0)
+        self.assertEqual(record["size"], len(content))
+        self.assertNotIn("Server-Timing", response)
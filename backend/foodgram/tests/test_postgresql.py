@@ -0,0 +1,107 @@
+from unittest import mock, skipUnless
+
+import psycopg2
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from foodgram.db import pools
+from foodgram.postgresql.base import ConnectionPool, DatabaseWrapper
+
+IDLE = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+INTRANS = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.connection.executed.append(sql)
+        if not self.connection.autocommit:
+            self.connection.info.transaction_status = INTRANS
+
+
+class FakeConnection:
+    """Соединение psycopg2 без сервера: запрос вне autocommit
+    открывает транзакцию, set_session в транзакции запрещен
+    """
+
+    def __init__(self, **params):
+        self.autocommit = False
+        self.closed = 0
+        self.broken = False
+        self.executed = []
+        self.info = mock.Mock(transaction_status=IDLE)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.info.transaction_status = IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def set_session(self, **options):
+        if self.info.transaction_status != IDLE:
+            raise psycopg2.ProgrammingError(
+                "set_session cannot be used inside a transaction"
+            )
+
+
+@mock.patch.object(psycopg2, "connect", FakeConnection)
+class ConnectionPoolHealthCheckTest(SimpleTestCase):
+    """Проверка живости соединений при выдаче из пула"""
+
+    def setUp(self):
+        self.pool = ConnectionPool({}, size=2, timeout=1)
+
+    def test_new_connection_is_not_pinged(self):
+        conn = self.pool.acquire(DatabaseWrapper._ping)
+        self.assertEqual(conn.executed, [])
+        conn.set_session(autocommit=True)
+
+    def test_idle_connection_is_pinged_outside_transaction(self):
+        conn = self.pool.acquire(DatabaseWrapper._ping)
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(DatabaseWrapper._ping), conn)
+        self.assertEqual(conn.executed, ["SELECT 1"])
+        self.assertEqual(conn.info.transaction_status, IDLE)
+        conn.set_session(autocommit=True)
+        self.assertEqual(self.pool.metrics()["reused_total"], 1)
+
+    def test_broken_idle_connection_is_replaced(self):
+        conn = self.pool.acquire(DatabaseWrapper._ping)
+        self.pool.release(conn)
+        conn.broken = True
+        replacement = self.pool.acquire(DatabaseWrapper._ping)
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.pool.release(replacement)
+        self.assertEqual(self.pool.metrics()["in_use"], 0)
+
+
+@skipUnless(connection.vendor == "postgresql", "нужен PostgreSQL")
+class PooledConnectionTest(TransactionTestCase):
+    """Повторная выдача соединения из пула с HEALTH_CHECKS"""
+
+    def test_reconnect_with_health_checks(self):
+        settings = {**connection.settings_dict, "POOL_SIZE": 1,
+                    "HEALTH_CHECKS": True}
+        wrapper = DatabaseWrapper(settings, alias="pool-test")
+        self.addCleanup(pools.pop, "pool-test", None)
+        for _ in range(3):
+            wrapper.ensure_connection()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                self.assertEqual(cursor.fetchone(), (1,))
+            wrapper.close()
+        self.assertEqual(pools["pool-test"].metrics()["opened_total"], 1)
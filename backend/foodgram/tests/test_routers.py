@@ -0,0 +1,38 @@
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+from foodgram.middleware import ReplicaRoutingMiddleware
+
+FILE_CACHE = {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": tempfile.gettempdir(),
+}
+LOCMEM_CACHE = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+
+class StickyCacheCheckTest(SimpleTestCase):
+    """С репликами метки прилипания хранятся в общем кеше"""
+
+    def middleware(self):
+        return ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    @override_settings(REPLICA_DATABASES=["replica1"],
+                       CACHES={"default": LOCMEM_CACHE,
+                               "recipes": LOCMEM_CACHE})
+    def test_local_memory_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.middleware()
+
+    @override_settings(REPLICA_DATABASES=["replica1"],
+                       CACHES={"default": LOCMEM_CACHE,
+                               "recipes": FILE_CACHE})
+    def test_shared_cache_is_accepted(self):
+        self.middleware()
+
+    @override_settings(REPLICA_DATABASES=[],
+                       CACHES={"default": LOCMEM_CACHE,
+                               "recipes": LOCMEM_CACHE})
+    def test_without_replicas_cache_is_not_checked(self):
+        self.middleware()
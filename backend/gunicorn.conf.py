@@ -0,0 +1,14 @@
+"""Настройки gunicorn.
+SERVER_MODE=wsgi — синхронные воркеры (по умолчанию),
+SERVER_MODE=asgi — воркеры uvicorn для foodgram.asgi:application.
+Представления в обоих режимах синхронные, замер режимов — в README
+"""
+import os
+
+bind = "0:8000"
+workers = int(os.getenv("GUNICORN_WORKERS", 3))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    worker_class = "uvicorn.workers.UvicornWorker"
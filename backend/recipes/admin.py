@@ -27,7 +27,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     def count_favorited(self, obj):
         """Метод выводит общее число добавлений рецепта в избранное"""
-        return obj.recipefavorites_set.count()
+        return obj.favorites_count
 
 
 class IngredientRecipesAdmin(admin.ModelAdmin):
@@ -6,3 +6,10 @@ class RecipesConfig(AppConfig):
     name = 'recipes'
     verbose_name = 'Рецепты'
     verbose_name = 'Управление рецептами'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from recipes import search, signals
+
+        post_migrate.connect(signals.create_indexes, sender=self)
+        post_migrate.connect(search.create_search_index, sender=self)
@@ -0,0 +1,165 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+from django.conf import settings
+from recipes.models import Ingredient, TableVersion, Tag
+
+
+def position(ids, pk):
+    """Индекс pk в отсортированном массиве ids или None"""
+    index = bisect_left(ids, pk)
+    if index < len(ids) and ids[index] == pk:
+        return index
+    return None
+
+
+class Catalogue:
+    """Неизменяемый снимок справочника в памяти процесса.
+    Снимок перечитывается при изменении версии таблицы в TableVersion,
+    версия проверяется не чаще раза в CATALOGUE_CHECK_INTERVAL секунд.
+    В своем процессе снимок сбрасывается сигналом сразу
+    """
+
+    table = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def load(self):
+        raise NotImplementedError
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if (snapshot is not None and time.monotonic() - self._checked_at
+                < settings.CATALOGUE_CHECK_INTERVAL):
+            return snapshot
+        with self._lock:
+            version, _ = TableVersion.current(self.table)[self.table]
+            if self._snapshot is None or version != self._version:
+                self._snapshot = self.load()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def version(self):
+        """Версия таблицы, по которой построен текущий снимок"""
+        self.snapshot()
+        return self._version
+
+    def invalidate(self):
+        """Сбрасывает снимок, следующий запрос перечитает справочник"""
+        self._snapshot = None
+
+    def lookup(self, pk):
+        """Строка справочника по id. Если id нет в снимке (запись
+        добавлена в другом процессе), снимок перечитывается один раз
+        """
+        row = self.snapshot().row(pk)
+        if row is not None:
+            return row
+        self.invalidate()
+        return self.snapshot().row(pk)
+
+
+class TagSnapshot(NamedTuple):
+    ids: array
+    representations: tuple
+    ids_by_slug: dict
+
+    def row(self, pk):
+        index = position(self.ids, pk)
+        return None if index is None else self.representations[index]
+
+
+class TagCatalogue(Catalogue):
+    """Теги: представление тега по id и id по слагу"""
+
+    table = TableVersion.TAGS
+
+    def load(self):
+        tags = list(Tag.objects.order_by("id").values("id", "name", "slug"))
+        return TagSnapshot(
+            ids=array("q", (tag["id"] for tag in tags)),
+            representations=tuple(tags),
+            ids_by_slug={tag["slug"]: tag["id"] for tag in tags},
+        )
+
+    def ids_by_slug(self):
+        return self.snapshot().ids_by_slug
+
+    def tag(self, pk):
+        """Словарь id, name, slug — как у TagSerializer"""
+        return self.lookup(pk)
+
+
+class IngredientSnapshot(NamedTuple):
+    ids: array
+    names: tuple
+    units: tuple
+    keys: list
+    ordered: list
+
+    def row(self, pk):
+        index = position(self.ids, pk)
+        if index is None:
+            return None
+        return self.names[index], self.units[index]
+
+
+class IngredientCatalogue(Catalogue):
+    """Ингредиенты: название и единица измерения по id,
+    а также список, отсортированный по названию,
+    для поиска по префиксу бинарным поиском
+    """
+
+    table = TableVersion.INGREDIENTS
+
+    def load(self):
+        rows = list(Ingredient.objects.order_by("id").values_list(
+            "id", "name", "measurement_unit"
+        ))
+        ordered = sorted(
+            (Ingredient(id=pk, name=name, measurement_unit=unit)
+             for pk, name, unit in rows),
+            key=lambda item: (item.name.casefold(), item.measurement_unit),
+        )
+        return IngredientSnapshot(
+            ids=array("q", (row[0] for row in rows)),
+            names=tuple(row[1] for row in rows),
+            units=tuple(row[2] for row in rows),
+            keys=[item.name.casefold() for item in ordered],
+            ordered=ordered,
+        )
+
+    def ingredient(self, pk):
+        """Пара (название, единица измерения) или None"""
+        return self.lookup(pk)
+
+    def autocomplete(self, query, limit):
+        """Ингредиенты, название которых начинается с query,
+        а за ними — содержащие query, не больше limit штук
+        """
+        snapshot = self.snapshot()
+        keys, ingredients = snapshot.keys, snapshot.ordered
+        query = query.casefold()
+        start = end = bisect_left(keys, query)
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = ingredients[start:min(end, start + limit)]
+        if len(result) < limit and query:
+            for index, key in enumerate(keys):
+                if query in key and not start <= index < end:
+                    result.append(ingredients[index])
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_catalogue = IngredientCatalogue()
+tag_catalogue = TagCatalogue()
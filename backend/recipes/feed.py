@@ -0,0 +1,59 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from recipes.models import FeedEntry, Follow, Recipe
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_INBOX_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт в ленты подписчиков автора"""
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list("user_id", flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                  author_id=recipe.author_id, pub_date=recipe.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора подписки"""
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )[:settings.FEED_INBOX_BACKFILL]
+    _bulk_insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                  author_id=author_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    )
+
+
+def drop(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки"""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_queryset(queryset, user):
+    """Рецепты авторов, на которых подписан пользователь.
+    По умолчанию — одним запросом с author_id IN (подписки),
+    при большом числе подписок — из материализованной ленты
+    в порядке ее индекса (user, pub_date, recipe)
+    """
+    if (settings.FEED_INBOX_ENABLED
+            and user.follower.count() >= settings.FEED_INBOX_MIN_FOLLOWING):
+        return queryset.filter(feed_entries__user=user).annotate(
+            feed_pub_date=F("feed_entries__pub_date")
+        ).order_by("-feed_pub_date", "-feed_entries__recipe_id")
+    return queryset.filter(
+        author__in=Follow.objects.filter(user=user).values("author")
+    )
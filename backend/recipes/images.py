@@ -0,0 +1,85 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from foodgram.constants import RECIPE_IMAGE_QUALITY, RECIPE_IMAGE_VARIANTS
+from PIL import Image, ImageOps
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "recipes/images/variants/"
+
+executor = (
+    ThreadPoolExecutor(max_workers=settings.RECIPE_IMAGE_WORKERS,
+                       thread_name_prefix="recipe-images")
+    if settings.RECIPE_IMAGE_WORKERS else None
+)
+
+
+def image_digest(file):
+    """SHA-256 содержимого загруженного файла"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def variant_name(source, variant, image_format):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f"{VARIANTS_DIR}{stem}_{variant}.{image_format.lower()}"
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == "JPEG" and variant.mode not in ("RGB", "L"):
+        variant = variant.convert("RGB")
+    buffer = io.BytesIO()
+    variant.save(buffer, image_format, quality=RECIPE_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def build_variants(recipe_id, source):
+    """Создает варианты изображения и сохраняет ссылки на них в рецепте"""
+    try:
+        with default_storage.open(source) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        variants = {"source": source}
+        for variant, (size, image_format) in RECIPE_IMAGE_VARIANTS.items():
+            name = variant_name(source, variant, image_format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[variant] = default_storage.save(
+                name, ContentFile(render_variant(image, size, image_format))
+            )
+        recipe = Recipe.objects.filter(pk=recipe_id, image=source).first()
+        if recipe is not None:
+            recipe.image_variants = variants
+            recipe.save(update_fields=["image_variants", "updated_at"])
+    except Exception:
+        logger.exception("Не удалось обработать изображение %s", source)
+    finally:
+        if executor is not None:
+            connection.close()
+
+
+def schedule_variants(recipe):
+    """Ставит обработку изображения в очередь после фиксации транзакции"""
+    recipe_id, source = recipe.pk, recipe.image.name
+
+    def submit():
+        if executor is None:
+            build_variants(recipe_id, source)
+        else:
+            executor.submit(build_variants, recipe_id, source)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Создание уменьшенных вариантов изображений рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Пересоздать варианты для всех рецептов",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipes = Recipe.objects.exclude(image="").only(
+            "id", "image", "image_variants"
+        )
+        for recipe in recipes.iterator():
+            source = recipe.image.name
+            if options["all"] or recipe.image_variants.get("source") != source:
+                build_variants(recipe.pk, source)
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано изображений: {processed}"
+        ))
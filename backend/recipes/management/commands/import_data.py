@@ -1,33 +1,143 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from recipes.models import Ingredient
+from recipes.models import Ingredient, TableVersion
 
+HEADER = ["name", "measurement_unit"]
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1],
-    )
 
+def read_csv(file):
+    """Построчно читает ингредиенты из CSV,
+    строка заголовка при наличии пропускается
+    """
+    for row in csv.reader(file):
+        if len(row) >= 2 and row[:2] != HEADER:
+            yield row[0], row[1]
 
-action = {
-    "ingredients.csv": ingredient_create,
+
+def read_json(file):
+    """Читает ингредиенты из JSON-списка объектов,
+    в том числе в формате фикстуры Django
+    """
+    for item in json.load(file):
+        fields = item.get("fields", item)
+        yield fields["name"], fields["measurement_unit"]
+
+
+readers = {
+    ".csv": read_csv,
+    ".json": read_json,
 }
 
 
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
 class Command(BaseCommand):
+    help = ("Импорт ингредиентов из CSV/JSON файлов папки data. "
+            "Повторный запуск не создает дубликатов")
+
     def add_arguments(self, parser):
         parser.add_argument("filename", nargs="+", type=str)
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Количество строк в одной пачке вставки",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только прочитать файлы, ничего не записывая",
+        )
+        parser.add_argument(
+            "--copy", action="store_true",
+            help="Загрузка через COPY во временную таблицу (PostgreSQL)",
+        )
 
     def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля")
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("--copy поддерживается только PostgreSQL")
         for filename in options["filename"]:
-            path = os.path.join(settings.BASE_DIR, "data/") + filename
-            with open(path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                next(reader)
-                for row in reader:
-                    action[filename](row)
+            path = os.path.join(settings.CSV_FILES_DIR, filename)
+            reader = readers.get(os.path.splitext(filename)[1])
+            if reader is None:
+                raise CommandError(f"Неизвестный формат файла {filename}")
+            self.import_file(path, reader, options)
+
+    def import_file(self, path, reader, options):
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        with open(path, "r", encoding="utf-8") as file:
+            rows = (
+                (name.strip(), measurement_unit.strip())
+                for name, measurement_unit in reader(file)
+                if name.strip()
+            )
+            batches = batched(rows, options["batch_size"])
+            if options["dry_run"]:
+                processed = sum(len(batch) for batch in batches)
+            elif options["copy"]:
+                processed = self.copy_batches(batches)
+            else:
+                processed = self.insert_batches(batches)
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - count_before
+        if created:
+            TableVersion.bump(TableVersion.INGREDIENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f"{os.path.basename(path)}: прочитано {processed}, "
+            f"добавлено {created} за {elapsed:.2f} с "
+            f"({processed / max(elapsed, 1e-6):.0f} строк/с)"
+        ))
+
+    def insert_batches(self, batches):
+        processed = 0
+        for batch in batches:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch],
+                ignore_conflicts=True,
+            )
+            processed += len(batch)
+        return processed
+
+    @transaction.atomic
+    def copy_batches(self, batches):
+        processed = 0
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE ingredient_import "
+                "(name varchar(200), measurement_unit varchar(200)) "
+                "ON COMMIT DROP"
+            )
+            for batch in batches:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY ingredient_import FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+                processed += len(batch)
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit "
+                "FROM ingredient_import "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+        return processed
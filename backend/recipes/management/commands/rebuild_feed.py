@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import feed
+from recipes.models import FeedEntry, Follow
+
+
+class Command(BaseCommand):
+    help = "Перестроение материализованной ленты подписок"
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        FeedEntry.objects.all().delete()
+        follows = Follow.objects.values_list("user_id", "author_id")
+        for user_id, author_id in follows.iterator():
+            feed.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Записей в лентах: {FeedEntry.objects.count()}"
+        ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Recipe, RecipeFavorites, ShoppingList
+from users.models import User
+
+
+def count_by(model, field):
+    """Подзапрос COUNT(*) строк model, ссылающихся на внешний объект"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = ("Пересчет счетчиков избранного, списков покупок "
+            "и количества рецептов авторов")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.annotate(
+            actual_favorites=count_by(RecipeFavorites, "recipes"),
+            actual_in_carts=count_by(ShoppingList, "recipes"),
+        ).filter(
+            ~Q(favorites_count=F("actual_favorites"))
+            | ~Q(in_carts_count=F("actual_in_carts"))
+        ).values_list("pk", flat=True)
+        fixed_recipes = Recipe.objects.filter(pk__in=list(recipes)).update(
+            favorites_count=count_by(RecipeFavorites, "recipes"),
+            in_carts_count=count_by(ShoppingList, "recipes"),
+        )
+        authors = User.objects.annotate(
+            actual_recipes=count_by(Recipe, "author"),
+        ).exclude(
+            recipes_count=F("actual_recipes")
+        ).values_list("pk", flat=True)
+        fixed_authors = User.objects.filter(pk__in=list(authors)).update(
+            recipes_count=count_by(Recipe, "author"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлено рецептов: {fixed_recipes}, "
+            f"авторов: {fixed_authors}"
+        ))
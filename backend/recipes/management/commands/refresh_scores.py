@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = ("Пересчет рейтингов popular/trending по добавлениям "
+            "в избранное и списки покупок")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересчитать рейтинги заново по всем событиям",
+        )
+        parser.add_argument(
+            "--loop", type=int, default=0, metavar="SECONDS",
+            help="Повторять пересчет с указанным интервалом",
+        )
+
+    def handle(self, *args, **options):
+        if options["loop"] < 0:
+            raise CommandError("--loop не может быть отрицательным")
+        full = options["full"]
+        while True:
+            started = time.perf_counter()
+            updated = refresh_scores(full=full)
+            self.stdout.write(self.style.SUCCESS(
+                f"Обновлено рейтингов: {updated} "
+                f"за {time.perf_counter() - started:.2f} с"
+            ))
+            if not options["loop"]:
+                return
+            full = False
+            close_old_connections()
+            time.sleep(options["loop"])
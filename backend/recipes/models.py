@@ -1,5 +1,10 @@
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import (BooleanField, Count, Exists, F, FloatField,
+                              OuterRef, Subquery, Value)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils import timezone
 from users.models import User
 
 
@@ -39,6 +44,186 @@ class Ingredient(models.Model):
         return f"{self.name} {self.measurement_unit}"
 
 
+class TableVersion(models.Model):
+    """Модель Версия справочника.
+    Счетчик увеличивается при каждом изменении таблицы
+    и используется для ETag / Last-Modified
+    """
+    TAGS = "tags"
+    INGREDIENTS = "ingredients"
+    SCORES = "recipe_scores"
+    # Публичные поля авторов рецептов
+    AUTHORS = "authors"
+
+    name = models.CharField("Таблица", max_length=50, unique=True)
+    version = models.PositiveBigIntegerField("Версия", default=0)
+    updated_at = models.DateTimeField("Дата изменения", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Версия справочника"
+        verbose_name_plural = "Версии справочников"
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+    @classmethod
+    def bump(cls, name, now=None):
+        """Атомарно увеличивает версию таблицы"""
+        now = now or timezone.now()
+        updated = cls.objects.filter(name=name).update(
+            version=F("version") + 1, updated_at=now
+        )
+        if not updated:
+            cls.objects.get_or_create(
+                name=name, defaults={"version": 1, "updated_at": now}
+            )
+
+    @classmethod
+    def current(cls, *names):
+        """Словарь {таблица: (версия, дата изменения)}"""
+        versions = dict.fromkeys(names, (0, None))
+        versions.update(
+            (name, (version, updated_at))
+            for name, version, updated_at in cls.objects.filter(
+                name__in=names
+            ).values_list("name", "version", "updated_at")
+        )
+        return versions
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов с аннотациями
+    для текущего пользователя"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._with_tag_ids = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_tag_ids = self._with_tag_ids
+        return clone
+
+    def _fetch_all(self):
+        loaded = self._result_cache is not None
+        super()._fetch_all()
+        if self._with_tag_ids and not loaded:
+            attach_tag_ids(
+                [obj for obj in self._result_cache if isinstance(obj, Recipe)]
+            )
+
+    def with_tag_ids(self):
+        """Загружает id тегов рецептов в атрибут tag_ids
+        одним запросом к таблице связей, без соединения с тегами
+        """
+        clone = self._chain()
+        clone._with_tag_ids = True
+        return clone
+
+    def with_related(self):
+        """Подгружает автора, id тегов и строки ингредиентов рецептов
+        фиксированным числом запросов. Названия тегов и ингредиентов
+        берутся из справочников в памяти процесса
+        """
+        return self.select_related("author").prefetch_related(
+            "ingredientrecipes_set"
+        ).with_tag_ids()
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами is_favorited,
+        is_in_shopping_cart и подпиской на автора
+        одним запросом на страницу
+        """
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(RecipeFavorites.objects.filter(
+                user=user, recipes=OuterRef("pk")
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipes=OuterRef("pk")
+            )),
+            author_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef("author")
+            )),
+        )
+
+    def ranked_by(self, ranking):
+        """Сортировка по предрассчитанному рейтингу RecipeScore.
+        Строка рейтинга есть у каждого рецепта, поэтому соединение
+        внутреннее и порядок совпадает с индексом score_<ranking>_idx
+        """
+        return self.filter(score__isnull=False).annotate(
+            rank=F(f"score__{ranking}")
+        ).order_by("-rank", "-score__recipe_id")
+
+    def covering(self, ingredient_ids, require_all=False):
+        """Рецепты, в которых есть хотя бы один (или при require_all —
+        каждый) из ингредиентов, с долей имеющихся ингредиентов coverage.
+        Кандидаты выбираются группировкой по индексу
+        (ingredients, recipes), доли считаются только для них
+        """
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return self.none()
+        links = IngredientRecipes.objects.order_by()
+        candidates = links.filter(ingredients__in=ingredient_ids)
+        if require_all:
+            candidates = candidates.values("recipes").annotate(
+                matched=Count("pk")
+            ).filter(matched=len(ingredient_ids))
+        matched = links.filter(
+            recipes=OuterRef("pk"), ingredients__in=ingredient_ids
+        ).values("recipes").annotate(count=Count("pk")).values("count")
+        total = links.filter(
+            recipes=OuterRef("pk")
+        ).values("recipes").annotate(count=Count("pk")).values("count")
+        return self.filter(
+            id__in=candidates.values("recipes")
+        ).annotate(
+            coverage=Cast(Subquery(matched), FloatField())
+            / Cast(Subquery(total), FloatField())
+        ).order_by("-coverage", "-pub_date", "-id")
+
+    def latest_per_author(self, author_ids, limit):
+        """Не больше limit последних рецептов каждого из авторов
+        одним запросом с ROW_NUMBER() OVER (PARTITION BY author_id)
+        """
+        author_ids = list(author_ids)
+        if not author_ids:
+            return self.none()
+        placeholders = ", ".join(["%s"] * len(author_ids))
+        ranked = RawSQL(
+            "SELECT id FROM ("
+            "SELECT id, ROW_NUMBER() OVER ("
+            "PARTITION BY author_id ORDER BY pub_date DESC, id DESC"
+            ") AS position "
+            f"FROM {self.model._meta.db_table} "
+            f"WHERE author_id IN ({placeholders})"
+            ") AS ranked WHERE position <= %s",
+            [*author_ids, limit],
+        )
+        return self.filter(id__in=ranked)
+
+
+def attach_tag_ids(recipes):
+    """Записывает в recipe.tag_ids список id тегов рецепта"""
+    if not recipes:
+        return
+    tag_ids = {recipe.pk: [] for recipe in recipes}
+    links = Recipe.tags.through.objects.filter(
+        recipe_id__in=list(tag_ids)
+    ).order_by("tag_id").values_list("recipe_id", "tag_id")
+    for recipe_id, tag_id in links:
+        tag_ids[recipe_id].append(tag_id)
+    for recipe in recipes:
+        recipe.tag_ids = tag_ids[recipe.pk]
+
+
 class Recipe(models.Model):
     """Модель Рецепт"""
     ingredients = models.ManyToManyField(
@@ -60,8 +245,23 @@ class Recipe(models.Model):
     name = models.CharField("Название рецепта", max_length=200)
     image = models.ImageField("Ссылка на изображение",
                               upload_to="recipes/images/")
+    image_hash = models.CharField("SHA-256 изображения",
+                                  max_length=64,
+                                  blank=True,
+                                  editable=False)
+    image_variants = models.JSONField("Варианты изображения",
+                                      default=dict,
+                                      blank=True,
+                                      editable=False)
     text = models.TextField("Описание рецепта")
     pub_date = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField("Добавлений в избранное",
+                                                  default=0,
+                                                  editable=False)
+    in_carts_count = models.PositiveIntegerField("Добавлений в покупки",
+                                                 default=0,
+                                                 editable=False)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
     cooking_time = models.PositiveIntegerField(
         "Время приготовления в мин",
         validators=[
@@ -70,15 +270,73 @@ class Recipe(models.Model):
         ],
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ["-pub_date"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"],
+                         name="recipe_pub_date_id_idx"),
+        ]
 
     def __str__(self):
         return f"Рецепт {self.name} | Составил: {self.author}"
 
 
+class RecipeScore(models.Model):
+    """Модель Рейтинг рецепта.
+    Сумма добавлений в избранное и покупки с экспоненциальным
+    затуханием, пересчитывается командой refresh_scores.
+    Строка создается вместе с рецептом
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="score",
+        verbose_name="Рецепт",
+    )
+    popular = models.FloatField("Популярность", default=0)
+    trending = models.FloatField("Тренд", default=0)
+
+    class Meta:
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+        indexes = [
+            models.Index(fields=["-popular", "-recipe"],
+                         name="score_popular_idx"),
+            models.Index(fields=["-trending", "-recipe"],
+                         name="score_trending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.popular:.2f} / {self.trending:.2f}"
+
+
+class RecipeScoreRemoval(models.Model):
+    """Модель Удаленное событие рейтинга.
+    Удаление из избранного или списка покупок, вклад которого
+    refresh_scores вычитает из рейтинга рецепта
+    """
+    id = models.AutoField(primary_key=True)
+    # Не внешний ключ: строки создаются и при каскадном удалении рецепта
+    recipe_id = models.PositiveIntegerField("Рецепт")
+    weight = models.FloatField("Вес события")
+    created_at = models.DateTimeField("Дата добавления")
+    removed_at = models.DateTimeField("Дата удаления",
+                                      default=timezone.now,
+                                      db_index=True)
+
+    class Meta:
+        verbose_name = "Удаленное событие рейтинга"
+        verbose_name_plural = "Удаленные события рейтинга"
+
+    def __str__(self):
+        return f"{self.recipe_id}: -{self.weight}"
+
+
 class IngredientRecipes(models.Model):
     """Модель для связи рецепта и ингредиентов"""
     id = models.AutoField(primary_key=True)
@@ -106,6 +364,10 @@ class IngredientRecipes(models.Model):
                 name="unique_ingredients_recipes"
             )
         ]
+        indexes = [
+            models.Index(fields=["ingredients", "recipes"],
+                         name="ingredient_recipes_idx"),
+        ]
 
     def __str__(self):
         return f"{self.recipes.name}:{self.ingredients.name}"
@@ -120,6 +382,9 @@ class ShoppingList(models.Model):
     recipes = models.ForeignKey(Recipe,
                                 verbose_name="Рецепт",
                                 on_delete=models.CASCADE)
+    created_at = models.DateTimeField("Дата добавления",
+                                      default=timezone.now,
+                                      db_index=True)
 
     class Meta:
         verbose_name = "Список покупок"
@@ -143,6 +408,9 @@ class RecipeFavorites(models.Model):
     recipes = models.ForeignKey(Recipe,
                                 verbose_name="Рецепт",
                                 on_delete=models.CASCADE)
+    created_at = models.DateTimeField("Дата добавления",
+                                      default=timezone.now,
+                                      db_index=True)
 
     class Meta:
         verbose_name = "Список избранного"
@@ -187,3 +455,45 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.user.username} подписан на {self.author.username}"
+
+
+class FeedEntry(models.Model):
+    """Модель Лента подписок.
+    Рецепт автора, размноженный по подписчикам при публикации
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name="Подписчик",
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name="Рецепт",
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name="Автор рецепта",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "recipe"],
+                                    name="unique_feed_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-recipe"],
+                         name="feed_user_pub_date_idx"),
+            models.Index(fields=["user", "author"],
+                         name="feed_user_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} в ленте {self.user_id}"
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from foodgram.constants import (RECIPE_SCORE_BATCH_SIZE,
+                                RECIPE_SCORE_COMMIT_DELAY,
+                                RECIPE_SCORE_HALF_LIFE, RECIPE_SCORE_WEIGHTS)
+from recipes.models import (Recipe, RecipeFavorites, RecipeScore,
+                            RecipeScoreRemoval, ShoppingList, TableVersion)
+
+RANKINGS = tuple(RECIPE_SCORE_HALF_LIFE)
+
+EVENT_SOURCES = (
+    (RecipeFavorites, RECIPE_SCORE_WEIGHTS["favorite"]),
+    (ShoppingList, RECIPE_SCORE_WEIGHTS["shopping_cart"]),
+)
+EVENT_WEIGHTS = dict(EVENT_SOURCES)
+
+
+def decay(seconds, ranking):
+    """Множитель затухания рейтинга за seconds секунд"""
+    return 0.5 ** (max(seconds, 0) / RECIPE_SCORE_HALF_LIFE[ranking])
+
+
+def add_event(values, weight, created_at, now):
+    """Прибавляет к рейтингам вклад события на момент now"""
+    age = (now - created_at).total_seconds()
+    for ranking in RANKINGS:
+        values[ranking] += weight * decay(age, ranking)
+
+
+def collect_increments(since, now, removals, started):
+    """Вклад событий из (since, now] в рейтинги на момент now.
+    События читаются по состоянию на started, поэтому удаленные
+    позже started еще учитываются, а удаленные до started вычитаются,
+    только если их учел прошлый пересчет (добавлены не позже since)
+    """
+    increments = defaultdict(lambda: dict.fromkeys(RANKINGS, 0.0))
+    for model, weight in EVENT_SOURCES:
+        events = model.objects.filter(created_at__lte=now)
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        for recipe_id, created_at in events.values_list(
+            "recipes_id", "created_at"
+        ).iterator():
+            add_event(increments[recipe_id], weight, created_at, now)
+    for removal in removals:
+        counted = since is not None and removal.created_at <= since
+        if removal.removed_at <= started and counted:
+            add_event(increments[removal.recipe_id], -removal.weight,
+                      removal.created_at, now)
+        elif (removal.removed_at > started and not counted
+                and removal.created_at <= now):
+            add_event(increments[removal.recipe_id], removal.weight,
+                      removal.created_at, now)
+    return increments
+
+
+def create_missing_scores():
+    """Создает нулевые рейтинги рецептов, у которых их нет"""
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=pk) for pk in Recipe.objects.filter(
+            score__isnull=True
+        ).values_list("pk", flat=True).iterator()),
+        batch_size=RECIPE_SCORE_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+@transaction.atomic
+def refresh_scores(full=False, now=None):
+    """Обновляет рейтинги рецептов.
+    Инкрементально: старые значения затухают на время с прошлого
+    пересчета, к ним прибавляется вклад новых событий и вычитается
+    вклад удаленных. Полный пересчет строит рейтинги заново
+    по всем событиям. Рейтинги считаются на момент
+    RECIPE_SCORE_COMMIT_DELAY секунд назад: равномерное затухание
+    не меняет порядок, а события из медленных транзакций
+    не пропускаются
+    """
+    started = now or timezone.now()
+    now = started - timedelta(seconds=RECIPE_SCORE_COMMIT_DELAY)
+    _, since = TableVersion.current(TableVersion.SCORES)[TableVersion.SCORES]
+    create_missing_scores()
+    # Удаления до started обрабатываются сейчас, более поздние
+    # остаются до следующего пересчета
+    removals = list(RecipeScoreRemoval.objects.order_by("id"))
+    if full or since is None:
+        RecipeScore.objects.update(**dict.fromkeys(RANKINGS, 0.0))
+        since = None
+    elif now > since:
+        elapsed = (now - since).total_seconds()
+        RecipeScore.objects.update(**{
+            ranking: F(ranking) * decay(elapsed, ranking)
+            for ranking in RANKINGS
+        })
+    increments = collect_increments(since, now, removals, started)
+    # Рейтинги удаленных рецептов удалены вместе с ними
+    scores = RecipeScore.objects.in_bulk(list(increments))
+    for recipe_id, score in scores.items():
+        for ranking, value in increments[recipe_id].items():
+            setattr(score, ranking, max(getattr(score, ranking) + value, 0.0))
+    RecipeScore.objects.bulk_update(
+        scores.values(), RANKINGS, batch_size=RECIPE_SCORE_BATCH_SIZE
+    )
+    RecipeScoreRemoval.objects.filter(id__in=[
+        removal.id for removal in removals if removal.removed_at <= started
+    ]).delete()
+    TableVersion.bump(TableVersion.SCORES, now=now)
+    return len(scores)
@@ -0,0 +1,104 @@
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+TABLE = "recipes_recipe"
+FTS_TABLE = "recipes_recipe_fts"
+
+# tsvector хранится в генерируемой колонке и пересчитывается самой базой
+# при каждой записи name или text, название весит больше описания
+POSTGRES_SEARCH = [
+    f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('{config}', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce(text, '')), 'B')"
+    ") STORED",
+    f"CREATE INDEX IF NOT EXISTS recipes_recipe_search_gin "
+    f"ON {TABLE} USING gin (search_vector)",
+]
+
+# Внешний индекс FTS5 поверх таблицы рецептов, синхронизируется триггерами
+SQLITE_SEARCH = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, text, content='{TABLE}', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} "
+    f"BEGIN INSERT INTO {FTS_TABLE}(rowid, name, text) "
+    "VALUES (new.id, new.name, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) "
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    f"AFTER UPDATE OF name, text ON {TABLE} "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) "
+    "VALUES ('delete', old.id, old.name, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, text) "
+    "VALUES (new.id, new.name, new.text); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def create_search_index(sender, using, **kwargs):
+    """Создает полнотекстовый индекс рецептов для текущей базы"""
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        statements = [
+            statement.replace("{config}", settings.RECIPES_SEARCH_CONFIG)
+            for statement in POSTGRES_SEARCH
+        ]
+    elif connection.vendor == "sqlite":
+        statements = SQLITE_SEARCH
+    else:
+        return
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    except DatabaseError as error:
+        logger.warning("Полнотекстовый индекс не создан: %s", error)
+
+
+def fts5_query(query):
+    """Запрос FTS5 из слов пользователя: каждое слово в кавычках
+    ищется как префикс, служебный синтаксис FTS5 не интерпретируется
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def search(queryset, query):
+    """Рецепты, подходящие под поисковый запрос,
+    с релевантностью search_rank по убыванию
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        tsquery = (f"websearch_to_tsquery("
+                   f"'{settings.RECIPES_SEARCH_CONFIG}', %s)")
+        queryset = queryset.annotate(search_rank=RawSQL(
+            f"ts_rank_cd({TABLE}.search_vector, {tsquery})", [query]
+        )).filter(id__in=RawSQL(
+            f"SELECT id FROM {TABLE} WHERE search_vector @@ {tsquery}",
+            [query],
+        ))
+    elif connection.vendor == "sqlite":
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        # bm25 тем меньше, чем выше релевантность; веса колонок name, text
+        queryset = queryset.annotate(search_rank=RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id",
+            [match],
+        )).filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        ))
+    else:
+        queryset = queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).filter(Q(name__icontains=query) | Q(text__icontains=query))
+    return queryset.order_by("-search_rank", "-pub_date", "-id")
@@ -0,0 +1,113 @@
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes import feed
+from recipes.catalogue import ingredient_catalogue, tag_catalogue
+from recipes.images import schedule_variants
+from recipes.models import (Follow, Ingredient, Recipe, RecipeFavorites,
+                            RecipeScore, RecipeScoreRemoval, ShoppingList,
+                            TableVersion, Tag)
+from recipes.scores import EVENT_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    # Фильтр по тегам: поиск рецептов по tag_id без обращения к таблице
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_tags_tag_recipe "
+    "ON recipes_recipe_tags (tag_id, recipe_id)",
+]
+
+POSTGRES_INDEXES = [
+    # Префиксный поиск ?name= (istartswith -> UPPER(name) LIKE 'X%')
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix "
+    "ON recipes_ingredient (UPPER(name::text) text_pattern_ops)",
+]
+
+POSTGRES_TRIGRAM_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Поиск по вхождению (icontains -> UPPER(name) LIKE '%X%')
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm "
+    "ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)",
+]
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_catalogue(sender, **kwargs):
+    """Сбрасывает справочник ингредиентов при изменении"""
+    ingredient_catalogue.invalidate()
+    TableVersion.bump(TableVersion.INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tags_changed(sender, **kwargs):
+    tag_catalogue.invalidate()
+    TableVersion.bump(TableVersion.TAGS)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    """Запускает создание вариантов для нового изображения"""
+    if (instance.image
+            and instance.image_variants.get("source") != instance.image.name):
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Раскладывает новый рецепт в ленты подписчиков"""
+    if created and settings.FEED_INBOX_ENABLED:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    """Нулевой рейтинг: сортировка по рейтингу идет
+    внутренним соединением по индексу
+    """
+    if created and not raw:
+        RecipeScore.objects.get_or_create(recipe=instance)
+
+
+@receiver(post_delete, sender=RecipeFavorites)
+@receiver(post_delete, sender=ShoppingList)
+def score_event_removed(sender, instance, **kwargs):
+    """Запоминает удаленное событие, чтобы вычесть его из рейтинга"""
+    RecipeScoreRemoval.objects.create(
+        recipe_id=instance.recipes_id,
+        weight=EVENT_WEIGHTS[sender],
+        created_at=instance.created_at,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and settings.FEED_INBOX_ENABLED:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if settings.FEED_INBOX_ENABLED:
+        feed.drop(instance.user_id, instance.author_id)
+
+
+def create_indexes(sender, using, **kwargs):
+    """Создает индексы, которые не выражаются через Meta.indexes"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for statement in INDEXES:
+            cursor.execute(statement)
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for statement in POSTGRES_INDEXES:
+            cursor.execute(statement)
+        try:
+            with transaction.atomic(using=using):
+                for statement in POSTGRES_TRIGRAM_INDEXES:
+                    cursor.execute(statement)
+        except DatabaseError as error:
+            logger.warning("Триграммный индекс не создан: %s", error)
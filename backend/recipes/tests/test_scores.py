@@ -0,0 +1,134 @@
+import shutil
+from datetime import timedelta
+
+from api.tests.test_recipes import MEDIA_ROOT, png_file
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from recipes.models import (Recipe, RecipeFavorites, RecipeScore,
+                            RecipeScoreRemoval, ShoppingList)
+from recipes.scores import refresh_scores
+from users.models import User
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RefreshScoresTest(TestCase):
+    """Инкрементальный пересчет рейтингов совпадает с полным"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author",
+            first_name="Author", last_name="Author", password="password",
+        )
+        cls.users = [
+            User.objects.create_user(
+                email=f"user{index}@example.com", username=f"user{index}",
+                first_name="User", last_name=str(index), password="password",
+            )
+            for index in range(3)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f"Рецепт {index}", text="Описание",
+                cooking_time=10, image=png_file(),
+            )
+            for index in range(4)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def scores(self):
+        return {
+            score.recipe_id: (score.popular, score.trending)
+            for score in RecipeScore.objects.all()
+        }
+
+    def assert_scores_equal(self, first, second):
+        self.assertEqual(first.keys(), second.keys())
+        for recipe_id, values in first.items():
+            for value, expected in zip(values, second[recipe_id]):
+                self.assertAlmostEqual(value, expected)
+
+    def test_every_recipe_has_score(self):
+        self.assertEqual(RecipeScore.objects.count(), len(self.recipes))
+        RecipeScore.objects.all().delete()
+        refresh_scores()
+        self.assertEqual(RecipeScore.objects.count(), len(self.recipes))
+
+    def test_removed_events_are_subtracted(self):
+        start = timezone.now()
+        for index, recipe in enumerate(self.recipes):
+            for user in self.users[:index + 1]:
+                RecipeFavorites.objects.create(
+                    user=user, recipes=recipe,
+                    created_at=start - timedelta(hours=index),
+                )
+            ShoppingList.objects.create(user=self.users[0], recipes=recipe,
+                                        created_at=start)
+        refresh_scores(full=True, now=start + timedelta(hours=1))
+        RecipeFavorites.objects.filter(recipes=self.recipes[3]).delete()
+        ShoppingList.objects.filter(recipes=self.recipes[0]).delete()
+        refresh_scores(now=start + timedelta(hours=2))
+        incremental = self.scores()
+        self.assertFalse(RecipeScoreRemoval.objects.exists())
+        refresh_scores(full=True, now=start + timedelta(hours=2))
+        self.assert_scores_equal(incremental, self.scores())
+
+    def test_late_committed_event_is_counted(self):
+        start = timezone.now()
+        refresh_scores(full=True, now=start)
+        # Событие зафиксировано после пересчета, но created_at раньше него
+        RecipeFavorites.objects.create(
+            user=self.users[0], recipes=self.recipes[0],
+            created_at=start - timedelta(seconds=30),
+        )
+        refresh_scores(now=start + timedelta(minutes=5))
+        self.assertGreater(
+            RecipeScore.objects.get(recipe=self.recipes[0]).popular, 0
+        )
+
+    def assert_incremental_matches_full(self, second_refresh):
+        # Удаление, созданное сейчас, приходится на start + 10 минут
+        start = timezone.now() - timedelta(minutes=10)
+        recipe = self.recipes[0]
+        RecipeFavorites.objects.create(
+            user=self.users[0], recipes=recipe,
+            created_at=start - timedelta(minutes=5),
+        )
+        removed = RecipeFavorites.objects.create(
+            user=self.users[1], recipes=recipe,
+            created_at=start + timedelta(minutes=5),
+        )
+        refresh_scores(full=True, now=start)
+        removed.delete()
+        refresh_scores(now=start + second_refresh)
+        refresh_scores(now=start + timedelta(minutes=20))
+        incremental = self.scores()
+        refresh_scores(full=True, now=start + timedelta(minutes=20))
+        self.assert_scores_equal(incremental, self.scores())
+        self.assertGreater(self.scores()[recipe.pk][0], 0)
+
+    def test_removal_after_refresh_crosses_window(self):
+        # Событие попало в окно второго пересчета и удалено после него
+        self.assert_incremental_matches_full(timedelta(minutes=6))
+
+    def test_removal_before_refresh_is_not_subtracted(self):
+        # Событие из окна второго пересчета удалено до его запуска:
+        # оно не было учтено и не вычитается
+        self.assert_incremental_matches_full(timedelta(minutes=10,
+                                                       seconds=30))
+
+    def test_ranked_by_uses_score_order(self):
+        RecipeScore.objects.filter(recipe=self.recipes[1]).update(popular=5)
+        RecipeScore.objects.filter(recipe=self.recipes[2]).update(popular=3)
+        ranked = list(Recipe.objects.ranked_by("popular"))
+        self.assertEqual(ranked[:2], [self.recipes[1], self.recipes[2]])
+        self.assertEqual(len(ranked), len(self.recipes))
+        if connection.vendor == "sqlite":
+            plan = Recipe.objects.ranked_by("popular")[:6].explain()
+            self.assertIn("score_popular_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
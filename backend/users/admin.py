@@ -4,7 +4,8 @@ from .models import User
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("id", "username", "first_name", "last_name", "email")
+    list_display = ("id", "username", "first_name", "last_name", "email",
+                    "recipes_count")
     search_fields = ("email", "username")
     list_filter = ("email", "username")
     empty_value_display = "-пусто-"
@@ -25,6 +25,11 @@ class User(AbstractUser):
         choices=ROLES_CHOICES,
         default=USER,
     )
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов",
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
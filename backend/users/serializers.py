@@ -24,6 +24,8 @@ class UserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки пользователя"""
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
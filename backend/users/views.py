@@ -1,11 +1,16 @@
 from api.pagination import CustomPagination
 from api.serializers import FollowSerializer
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
 from djoser.views import UserViewSet
+from foodgram.middleware import (SerializationMetricsMixin,
+                                 measure_serialization)
+from recipes.models import Follow, Recipe
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(SerializationMetricsMixin, UserViewSet):
     """ViewSet пользователя
     Получение списка пользователей /
     Получение определенного пользователя /
@@ -17,13 +22,43 @@ class UserViewSet(UserViewSet):
     """
 
     pagination_class = CustomPagination
+    replica_actions = ("list", "retrieve", "subscriptions")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef("pk")
+            ))
+        )
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        """Просмотр подписок пользователя"""
-        queryset = self.request.user.follower.all()
+        """Просмотр подписок пользователя.
+        Последние рецепты авторов страницы загружаются одним запросом
+        """
+        queryset = self.request.user.follower.select_related(
+            "author"
+        ).order_by("-id")
         page = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(page,
-                                      many=True,
-                                      context={"request": request})
+        author_ids = [follow.author_id for follow in page]
+        limit = request.query_params.get("recipes_limit", "")
+        if limit.isdigit():
+            recipes = Recipe.objects.latest_per_author(author_ids, int(limit))
+        else:
+            recipes = Recipe.objects.filter(author__in=author_ids)
+        prefetch_related_objects(
+            page,
+            Prefetch("author__recipes", queryset=recipes,
+                     to_attr="latest_recipes"),
+        )
+        serializer = measure_serialization(
+            request,
+            FollowSerializer(page, many=True, context={"request": request}),
+        )
         return self.get_paginated_response(serializer.data)